@@ -0,0 +1,64 @@
+# benchmarks/reprojection.py
+# Row-wise (notebook) vs batched Lambert-93 -> WGS84 reprojection.
+# python -m benchmarks.reprojection [rows]
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from datalib.cleaning import reproject_lambert93, _lambert93_transformer
+
+
+def reproject_rowwise(caracteristiques):
+    # Reference implementation, as it ran in cleaningdata.ipynb
+    transformer = _lambert93_transformer()
+
+    def is_projected_coordinate(lat, long):
+        return abs(lat) > 10000 or abs(long) > 10000
+
+    def convert_projected_to_latlong(lat, long):
+        if pd.notna(lat) and pd.notna(long):
+            long_wgs84, lat_wgs84 = transformer.transform(long, lat)
+            return lat_wgs84, long_wgs84
+        return None, None
+
+    for index, row in caracteristiques.iterrows():
+        if is_projected_coordinate(row['lat'], row['long']):
+            new_lat, new_long = convert_projected_to_latlong(row['lat'], row['long'])
+            if new_lat and new_long:
+                caracteristiques.at[index, 'lat'] = new_lat
+                caracteristiques.at[index, 'long'] = new_long
+    return caracteristiques
+
+def make_coordinates(rows, projected_share=0.3, seed=0):
+    # Mix of WGS84 degrees, Lambert-93 meters and missing values
+    rng = np.random.default_rng(seed)
+    lat = 46 + rng.normal(0, 2, rows)
+    long = 2.5 + rng.normal(0, 2, rows)
+    projected = rng.random(rows) < projected_share
+    lat[projected] = rng.uniform(6.1e6, 7.1e6, projected.sum())
+    long[projected] = rng.uniform(1e5, 1.2e6, projected.sum())
+    lat[rng.random(rows) < 0.01] = np.nan
+    return pd.DataFrame({'lat': lat, 'long': long})
+
+def run(rows):
+    data = make_coordinates(rows)
+
+    start = time.perf_counter()
+    expected = reproject_rowwise(data.copy())
+    rowwise_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = reproject_lambert93(data.copy())
+    batched_s = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(result, expected, check_exact=True)
+    return {'rows': rows, 'rowwise_s': rowwise_s, 'batched_s': batched_s, 'speedup': rowwise_s / batched_s}
+
+
+if __name__ == '__main__':
+    result = run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
+    print(f"{result['rows']} rows: row-wise {result['rowwise_s']:.2f}s, batched {result['batched_s']:.3f}s "
+          f"({result['speedup']:.0f}x faster, identical output)")
@@ -0,0 +1,55 @@
+# benchmarks/schema.py
+# Memory and merge time of the accidents tables, legacy string schema vs compact schema.
+# python -m benchmarks.schema
+
+import time
+
+import pandas as pd
+
+from datalib.accidents import CARACTERISTIQUES_PATH, USAGERS_PATH, compact_caracteristiques, compact_usagers, read_partitioned
+
+
+def to_legacy(caracteristiques, usagers):
+    # Layout written by the original cleaning notebook: string ids, 'HH:MM' times, string departments
+    caracteristiques = caracteristiques.copy()
+    usagers = usagers.copy()
+    if 'hour' in caracteristiques.columns:
+        caracteristiques['hrmn'] = (caracteristiques.pop('hour').astype(str).str.zfill(2) + ':' +
+                                    caracteristiques.pop('minute').astype(str).str.zfill(2))
+    caracteristiques['dep'] = caracteristiques['dep'].astype(str).astype(object)
+    for frame in (caracteristiques, usagers):
+        frame['num_acc'] = frame['num_acc'].astype(str)
+        for column in frame.columns:
+            if str(frame[column].dtype) in ('Int8', 'Int16', 'int8', 'int16'):
+                frame[column] = frame[column].astype('float64')
+    return caracteristiques, usagers
+
+def memory_mb(data):
+    return data.memory_usage(deep=True).sum() / 1e6
+
+def merge_seconds(caracteristiques, usagers, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pd.merge(usagers, caracteristiques.drop(columns=['annee']), on='num_acc', how='left')
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def run(caracteristiques, usagers):
+    results = {}
+    legacy = to_legacy(caracteristiques, usagers)
+    compact = compact_caracteristiques(caracteristiques), compact_usagers(usagers)
+    for name, (c, u) in [('legacy', legacy), ('compact', compact)]:
+        results[name] = {
+            'caracteristiques_mb': memory_mb(c),
+            'usagers_mb': memory_mb(u),
+            'merge_s': merge_seconds(c, u),
+        }
+    return results
+
+
+if __name__ == '__main__':
+    results = run(read_partitioned(CARACTERISTIQUES_PATH), read_partitioned(USAGERS_PATH))
+    print(f"{'schema':<10}{'caracteristiques (MB)':>24}{'usagers (MB)':>16}{'merge (s)':>12}")
+    for name, result in results.items():
+        print(f"{name:<10}{result['caracteristiques_mb']:>24.1f}{result['usagers_mb']:>16.1f}{result['merge_s']:>12.3f}")
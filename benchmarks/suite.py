@@ -0,0 +1,227 @@
+# benchmarks/suite.py
+# Timings and peak memory of the loaders, the aggregations and every section, headless.
+# python -m benchmarks.suite [--data DIR] [--repeat N] [--mode cold warm] [--only NAME] [--output PATH]
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from unittest import mock
+
+import numpy as np
+
+import config
+from datalib.datasets import cache_stats, clear_cache
+from datalib.figures import clear_figures
+from datalib.memory import dataset_sizes, memory_report, rss_bytes
+
+RESULTS_DIR = 'benchmarks/results'
+
+# Profile scored by the calculate_risk case
+RISK_PROFILE = ('18:00', 'Male', '75', 'Urban', 'Light Rain', '25-34', 'Work')
+
+
+class _Container:
+    # Column, tab or expander: a context manager forwarding every call to the stub
+    def __init__(self, streamlit):
+        self._streamlit = streamlit
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._streamlit, name)
+
+
+class StreamlitStub:
+    """
+    Stand-in for the streamlit module: display calls do nothing and widgets return their
+    default value, or the value stored in session_state under their key.
+    """
+
+    def __init__(self, session_state=None):
+        self.session_state = dict(session_state or {})
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def _widget(self, key, default):
+        if key is None:
+            return default
+        return self.session_state.setdefault(key, default)
+
+    def columns(self, spec, **kwargs):
+        return [_Container(self) for _ in range(spec if isinstance(spec, int) else len(spec))]
+
+    def tabs(self, labels):
+        return [_Container(self) for _ in labels]
+
+    def expander(self, *args, **kwargs):
+        return _Container(self)
+
+    def container(self, *args, **kwargs):
+        return _Container(self)
+
+    def selectbox(self, label, options, index=0, key=None, **kwargs):
+        return self._widget(key, list(options)[index] if index is not None and len(options) else None)
+
+    def radio(self, label, options, index=0, key=None, **kwargs):
+        return self._widget(key, list(options)[index] if index is not None and len(options) else None)
+
+    def multiselect(self, label, options, default=None, key=None, **kwargs):
+        return self._widget(key, list(default or []))
+
+    def slider(self, label, min_value=None, max_value=None, value=None, key=None, **kwargs):
+        return self._widget(key, value if value is not None else min_value)
+
+    def select_slider(self, label, options=(), value=None, key=None, **kwargs):
+        return self._widget(key, value if value is not None else list(options)[0])
+
+    def checkbox(self, label, value=False, key=None, **kwargs):
+        return self._widget(key, value)
+
+
+@contextlib.contextmanager
+def streamlit_stubbed(session_state=None):
+    """Replaces streamlit (and the AgGrid component) in the pages while the block runs."""
+    import pages.accidents
+    import pages.uberdata
+    import datalib.streamlitFunctions
+
+    stub = StreamlitStub(session_state)
+    with contextlib.ExitStack() as stack:
+        for module in (pages.accidents, pages.uberdata, datalib.streamlitFunctions):
+            stack.enter_context(mock.patch.object(module, 'st', stub))
+        for module in (pages.accidents, pages.uberdata):
+            stack.enter_context(mock.patch.object(module, 'AgGrid', lambda *args, **kwargs: None))
+        yield stub
+
+def benchmark_cases():
+    """(name, function) pairs; the functions take no argument and run one case."""
+    import pages.accidents as accidents
+    import pages.uberdata as uberdata
+    from datalib.plots import histogram_with_stats
+
+    cases = [
+        ('uberdata.get_data', lambda: uberdata.get_data()),
+        ('accidents.get_accidents_caracteristiques', lambda: accidents.get_accidents_caracteristiques()),
+        ('accidents.get_accidents_usagers', lambda: accidents.get_accidents_usagers()),
+        ('accidents.calculate_risk', lambda: accidents.calculate_risk(*RISK_PROFILE)),
+        ('plots.histogram_with_stats', lambda: histogram_with_stats(uberdata.get_data(('fare_amount',)), 'fare_amount', 'Fare amount')),
+        ('plots.histogram_with_stats[log]', lambda: histogram_with_stats(uberdata.get_data(('fare_amount',)), 'fare_amount', 'Fare amount', log=True)),
+    ]
+    for name, part in uberdata.parts_of_analysis.items():
+        cases.append((f'uberdata.section[{name}]', lambda part=part: part['function'](uberdata.load_part_data(part))))
+    for name, part in accidents.analysis_parts.items():
+        cases.append((f'accidents.section[{name}]', lambda part=part: part['function'](*accidents.load_section_data(part))))
+    return cases
+
+def _reset_caches():
+    clear_cache()
+    clear_figures()
+
+def measure(function, repeat, mode):
+    """
+    Runs a case repeat times and returns its timings and the peak memory of one more run,
+    traced on its own since tracemalloc slows the timed runs down, then the process RSS
+    and the deep size of the datasets the case left in the cache, and the dataset cache
+    counters summed over every dataset (of the last timed run when cold, of the warm-up and
+    every timed run when warm).
+
+    cold clears the dataset and figure caches before every run (first visit), warm runs the
+    case once before timing it (rerun of a visited page).
+    """
+    if mode == 'warm':
+        _reset_caches()
+        function()
+    timings = []
+    for _ in range(repeat):
+        if mode == 'cold':
+            _reset_caches()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    counters = ['hits', 'misses', 'invalidations', 'evictions']
+    cache = {counter: sum(stats[counter] for stats in cache_stats().values()) for counter in counters}
+
+    if mode == 'cold':
+        _reset_caches()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'runs': repeat,
+        'p50_s': float(np.percentile(timings, 50)),
+        'p95_s': float(np.percentile(timings, 95)),
+        'min_s': float(min(timings)),
+        'peak_mb': peak / 1e6,
+        'rss_mb': rss_bytes() / 1e6,
+        'cached_mb': dataset_sizes()['bytes'].sum() / 1e6,
+        'cache': cache,
+    }
+
+def run(repeat=5, modes=('cold', 'warm'), only=None, session_state=None):
+    started = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    results = []
+    with streamlit_stubbed(session_state):
+        for name, function in benchmark_cases():
+            if only and not any(pattern in name for pattern in only):
+                continue
+            for mode in modes:
+                result = {'name': name, 'mode': mode}
+                try:
+                    result.update(measure(function, repeat, mode))
+                except Exception as error:
+                    # Missing data files and the like: reported, the other cases still run
+                    result['error'] = f'{type(error).__name__}: {error}'
+                results.append(result)
+    return {
+        'started': started,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'repeat': repeat,
+        'data': config.DATA_DIR,
+        'memory': memory_report(),
+        'cases': results,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the loaders, aggregations and sections of both pages.')
+    parser.add_argument('--data', help=f'Data directory to read, e.g. data/synthetic (default: {config.DATA_DIR})')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case and mode')
+    parser.add_argument('--mode', nargs='*', choices=['cold', 'warm'], default=['cold', 'warm'])
+    parser.add_argument('--only', nargs='*', help='Only the cases whose name contains one of these')
+    parser.add_argument('--output', help=f'JSON file to write (default: a timestamped file in {RESULTS_DIR})')
+    args = parser.parse_args()
+    if args.data:
+        # Read by the loaders when the pages are imported, in benchmark_cases()
+        config.DATA_DIR = args.data
+
+    report = run(args.repeat, args.mode, args.only)
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    print(f"{'case':<60}{'mode':>6}{'p50 (s)':>10}{'p95 (s)':>10}{'peak (MB)':>11}{'cached (MB)':>13}")
+    for result in report['cases']:
+        if 'error' in result:
+            print(f"{result['name']:<60}{result['mode']:>6}  {result['error']}")
+        else:
+            print(f"{result['name']:<60}{result['mode']:>6}{result['p50_s']:>10.3f}{result['p95_s']:>10.3f}{result['peak_mb']:>11.1f}{result['cached_mb']:>13.1f}")
+    memory = report['memory']
+    print(f"RSS {memory['rss_mb']:.0f} MB, cached datasets {memory['datasets_mb']:.1f} MB, cached figures {memory['figures_mb']:.1f} MB")
+    print(f"Data read from {report['data']}, written to {output}")
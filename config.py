@@ -1,6 +1,8 @@
 
 
 
+import os
+
 # Constants
 TAB_TITLE = "Portfolio of a passionate Quant"
 PAGE_TITLE = "<Portfolio of a passionate Quantative analyst />"
@@ -9,4 +11,10 @@ LINKEDIN_LOGO = "https://static.vecteezy.com/system/resources/previews/023/986/9
 GITHUB_LOGO = "https://cdn-icons-png.flaticon.com/512/25/25231.png"
 UBERLOGO = "images/Uber_logo_2018.png"
 FAVICON_LOGO = "images/photo.png"
+# Data
+# Directory the datasets are read from and built in, e.g. PORTFOLIO_DATA=data/synthetic for the
+# tables written by datalib.synthetic
+DATA_ENV = "PORTFOLIO_DATA"
+DEFAULT_DATA_DIR = "data"
+DATA_DIR = os.environ.get(DATA_ENV, DEFAULT_DATA_DIR)
 
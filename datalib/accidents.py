@@ -0,0 +1,265 @@
+# datalib/accidents.py
+
+import os
+import operator
+import functools
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from config import DATA_DIR
+from datalib.cleaning import parse_hrmn
+from datalib.timing import timed_stage
+
+# Cleaned datasets, partitioned by year (annee=YYYY/part-0.parquet), written by datalib.etl
+CARACTERISTIQUES_PATH = os.path.join(DATA_DIR, 'accidents', 'caracteristiques')
+USAGERS_PATH = os.path.join(DATA_DIR, 'accidents', 'usagers')
+
+# Single-file outputs of the former cleaning notebook
+LEGACY_CARACTERISTIQUES_PATH = os.path.join(DATA_DIR, 'accidents', 'caracteristiques_cleaned.parquet')
+LEGACY_USAGERS_PATH = os.path.join(DATA_DIR, 'accidents', 'usagers_cleaned.parquet')
+
+# Compact schema of the cleaned parquet files: integer accident ids, small integers for
+# the coded columns (nullable where the raw data has gaps) and a categorical department
+CARACTERISTIQUES_SCHEMA = {
+    'num_acc': 'int64',
+    'annee': 'int16',
+    'mois': 'int8',
+    'jour': 'int8',
+    'hour': 'Int8',
+    'minute': 'Int8',
+    'lum': 'Int8',
+    'agg': 'Int8',
+    'int': 'Int8',
+    'atm': 'Int8',
+    'col': 'Int8',
+    'lat': 'float64',
+    'long': 'float64',
+    'dep': 'category',
+}
+USAGERS_SCHEMA = {
+    'num_acc': 'int64',
+    'annee': 'int16',
+    'place': 'Int8',
+    'catu': 'Int8',
+    'grav': 'Int8',
+    'sexe': 'Int8',
+    'trajet': 'Int8',
+    'an_nais': 'Int16',
+}
+
+# Categorical columns of the compact schemas, written as plain strings (see datalib.etl.write_partition)
+CATEGORY_COLUMNS = {column: dtype for column, dtype in CARACTERISTIQUES_SCHEMA.items() if dtype == 'category'}
+
+# Decoded labels for the coded columns (see columns.txt)
+WEATHER_MAP = {1: 'Normal', 2: 'Light Rain', 3: 'Heavy Rain', 4: 'Snow/Hail', 5: 'Fog/Smoke', 6: 'Strong Wind/Storm', 7: 'Dazzling', 8: 'Cloudy', 9: 'Other'}
+SEVERITY_MAP = {1: 'Unharmed', 2: 'Killed', 3: 'Hospitalized', 4: 'Light Injury'}
+COLLISION_MAP = {
+    1: 'Two vehicles - head-on',
+    2: 'Two vehicles - rear-end',
+    3: 'Two vehicles - side impact',
+    4: 'Chain collision (3+ vehicles)',
+    5: 'Multiple collisions (3+ vehicles)',
+    6: 'Other collision',
+    7: 'No collision'
+}
+TRIP_PURPOSE_MAP = {1: 'Home to work', 2: 'Home to school', 3: 'Shopping', 4: 'Professional', 5: 'Leisure', 6: 'Other', 7: 'Unknown'}
+POSITION_MAP = {
+    1: 'Driver',
+    2: 'Front Passenger',
+    3: 'Rear Left',
+    4: 'Rear Center',
+    5: 'Rear Right',
+    6: 'Middle Left',
+    7: 'Middle Right',
+    8: 'Other Position',
+    9: 'Unspecified'
+}
+GENDER_MAP = {1: 'Male', 2: 'Female'}
+
+# Characteristics columns build_user_facts needs (the users table is used whole)
+USER_FACT_CARACTERISTIQUES_COLUMNS = ('num_acc', 'annee', 'hour', 'lum', 'atm', 'col')
+
+# Label column -> (source column, mapping)
+USER_FACT_LABELS = {
+    'Weather Condition': ('atm', WEATHER_MAP),
+    'Severity': ('grav', SEVERITY_MAP),
+    'Collision Type': ('col', COLLISION_MAP),
+    'Trip Purpose': ('trajet', TRIP_PURPOSE_MAP),
+    'Position in Vehicle': ('place', POSITION_MAP),
+    'Gender': ('sexe', GENDER_MAP),
+}
+
+# Columns computed when a table is loaded, so that sections never add columns to the shared
+# frames: table -> {column: (columns it is computed from, function of the table)}, in
+# dependency order. Projections can name them like stored columns (see stored_columns).
+DERIVED_COLUMNS = {
+    'caracteristiques': {
+        'date': (('annee', 'mois', 'jour'), lambda data: pd.to_datetime(
+            pd.DataFrame({'year': data['annee'], 'month': data['mois'], 'day': data['jour']}), errors='coerce')),
+        # Monday=0, Sunday=6
+        'day_of_week': (('date',), lambda data: data['date'].dt.dayofweek.astype('Int8')),
+    },
+    'user_facts': {
+        'age': (('an_nais',), lambda data: pd.Timestamp.today().year - data['an_nais']),
+    },
+}
+
+
+def _derived_needed(table, columns):
+    # Derived columns a projection (None: every column) needs, dependencies included, in declaration order
+    derived = DERIVED_COLUMNS.get(table, {})
+    needed = set(derived) if columns is None else {column for column in columns if column in derived}
+    for column in reversed(list(derived)):
+        if column in needed:
+            needed.update(source for source in derived[column][0] if source in derived)
+    return [column for column in derived if column in needed]
+
+def stored_columns(table, columns):
+    """The stored columns to read for a projection: derived columns are replaced by their sources."""
+    if columns is None:
+        return None
+    derived = DERIVED_COLUMNS.get(table, {})
+    stored = [column for column in columns if column not in derived]
+    for column in _derived_needed(table, columns):
+        stored += [source for source in derived[column][0] if source not in derived]
+    return tuple(dict.fromkeys(stored))
+
+def add_derived_columns(data, table, columns=None):
+    """
+    Adds the derived columns of a projection (all of them for None) to a freshly loaded
+    table, then keeps only the projected columns.
+    """
+    for column in _derived_needed(table, columns):
+        data[column] = DERIVED_COLUMNS[table][column][1](data)
+    return data if columns is None else data[list(columns)]
+
+
+@timed_stage('aggregate')
+def build_user_facts(caracteristiques, usagers):
+    """
+    Joins every user involved in an accident with the characteristics of that accident.
+
+    One row per user: users whose accident has no characteristics row are kept with
+    empty accident columns, and the year always comes from the users table.
+    """
+    facts = pd.merge(usagers, caracteristiques.drop(columns=['annee']), on='num_acc', how='left')
+    # Labels as categoricals: a few bytes per user instead of a string object each
+    for label, (column, mapping) in USER_FACT_LABELS.items():
+        facts[label] = facts[column].map(mapping).astype('category')
+    return add_derived_columns(facts, 'user_facts')
+
+
+def _apply_schema(data, schema):
+    for column, dtype in schema.items():
+        if column not in data.columns or str(data[column].dtype) == dtype:
+            continue
+        if dtype == 'category':
+            data[column] = data[column].astype(str).astype('category')
+        else:
+            data[column] = pd.to_numeric(data[column]).astype(dtype)
+    return data
+
+def compact_caracteristiques(caracteristiques):
+    """Converts the cleaned characteristics (string ids, 'HH:MM' times) to the compact schema."""
+    caracteristiques = caracteristiques.copy()
+    if 'hrmn' in caracteristiques.columns:
+        caracteristiques['hour'], caracteristiques['minute'] = parse_hrmn(caracteristiques.pop('hrmn'))
+    return _apply_schema(caracteristiques, CARACTERISTIQUES_SCHEMA)
+
+def compact_usagers(usagers):
+    """Converts the cleaned users table to the compact schema."""
+    return _apply_schema(usagers.copy(), USAGERS_SCHEMA)
+
+def partition_years(path):
+    """Years of a partitioned dataset, from its directory names (annee=YYYY)."""
+    if not os.path.isdir(path):
+        return []
+    return sorted(int(name.split('=', 1)[1]) for name in os.listdir(path) if name.startswith('annee='))
+
+def whole_years(period):
+    """The (first, last) period extended to whole years: ((first year, 1), (last year, 12))."""
+    if period is None:
+        return None
+    (first_year, _), (last_year, _) = period
+    return (first_year, 1), (last_year, 12)
+
+def dataset_filter(period=None, departments=None, accidents=None):
+    """
+    pyarrow filter expression for a period ((first year, first month), (last year, last
+    month)), bounds included, a list of departments and a list of accident ids; None for
+    any of them means no filtering on it.
+
+    The month column (mois) is only used when the period does not cover whole years, so
+    that whole-year periods can be applied to tables without one.
+    """
+    # Row group statistics are only checked against comparisons (not isin), hence the
+    # chain of equalities and the id range
+    conditions = []
+    if period is not None:
+        (first_year, first_month), (last_year, last_month) = period
+        conditions += [ds.field('annee') >= first_year, ds.field('annee') <= last_year]
+        # The year conditions select the partitions, the month ones only apply to the first and last years
+        if first_month > 1:
+            conditions.append((ds.field('annee') > first_year) | (ds.field('mois') >= first_month))
+        if last_month < 12:
+            conditions.append((ds.field('annee') < last_year) | (ds.field('mois') <= last_month))
+    if departments is not None:
+        conditions.append(functools.reduce(operator.or_, [ds.field('dep') == department for department in departments]))
+    if accidents is not None:
+        if len(accidents):
+            conditions += [ds.field('num_acc') >= int(min(accidents)), ds.field('num_acc') <= int(max(accidents))]
+        conditions.append(ds.field('num_acc').isin(accidents))
+    return functools.reduce(operator.and_, conditions) if conditions else None
+
+@timed_stage('read')
+def read_partitioned(path, columns=None, filter=None):
+    """
+    Reads a year-partitioned dataset, or only the given columns of it. The filter (see
+    dataset_filter) is pushed down to pyarrow: years outside the range are not opened and
+    row groups whose statistics rule the filter out are skipped.
+    """
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    table = dataset.to_table(columns=list(columns) if columns is not None else None, filter=filter)
+    # Categorical columns are stored as plain strings, which keeps their row group statistics usable
+    categories = [column for column, dtype in CATEGORY_COLUMNS.items() if column in table.column_names]
+    data = table.to_pandas(categories=categories)
+    for column in categories:
+        data[column] = data[column].cat.reorder_categories(sorted(data[column].cat.categories))
+    # The year comes back from the directory names as a categorical
+    if 'annee' in data.columns:
+        data['annee'] = data['annee'].astype('int16')
+    return data
+
+def read_preview(path, rows=10):
+    # First rows of a partitioned dataset, without reading the other files
+    data = ds.dataset(path, format='parquet', partitioning='hive').head(rows).to_pandas()
+    if 'annee' in data.columns:
+        data['annee'] = data['annee'].astype('int16')
+    return data
+
+def validate_schema(data, schema, name, columns=None):
+    # Only the loaded columns are checked when the dataset was read with a projection
+    errors = []
+    for column, dtype in schema.items():
+        if columns is not None and column not in columns:
+            continue
+        if column not in data.columns:
+            errors.append(f"missing column '{column}'")
+        elif str(data[column].dtype) != dtype:
+            errors.append(f"'{column}' is {data[column].dtype}, expected {dtype}")
+    if errors:
+        raise ValueError(f"{name} does not match the compact schema ({', '.join(errors)}). "
+                         "Rebuild it with: python -m datalib.etl --force")
+    return data
+
+
+if __name__ == '__main__':
+    # Convert the single-file outputs of the former cleaning notebook to the partitioned layout
+    from datalib.etl import write_partitions, PARTITION_SORT
+
+    for table, source, compact, root in [('caracteristiques', LEGACY_CARACTERISTIQUES_PATH, compact_caracteristiques, CARACTERISTIQUES_PATH),
+                                         ('usagers', LEGACY_USAGERS_PATH, compact_usagers, USAGERS_PATH)]:
+        print(f"Converting {source} to {root}...")
+        write_partitions(compact(pd.read_parquet(source)), root, PARTITION_SORT[table])
+    print("Done.")
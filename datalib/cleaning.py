@@ -0,0 +1,98 @@
+# datalib/cleaning.py
+# Cleaning of the raw accidents files (formerly the cells of cleaningdata.ipynb).
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+CARACTERISTIQUES_DROPPED = ['Unnamed: 0', "adr", "gps", 'com']
+USAGERS_DROPPED = ['num_veh', "id_vehicule", "secu1", "secu2", "secu3", "secu", "locp", "actp", "etatp", "Unnamed: 0"]
+
+# Any coordinate outside typical lat/long ranges is in a projected format (meters)
+PROJECTED_THRESHOLD = 10000
+
+# Lambert-93 (EPSG:2154) to WGS84 (EPSG:4326)
+_transformer = None
+
+
+def _lambert93_transformer():
+    global _transformer
+    if _transformer is None:
+        from pyproj import Transformer
+        _transformer = Transformer.from_crs("EPSG:2154", "EPSG:4326", always_xy=True)
+    return _transformer
+
+def projected_mask(lat, long):
+    return ((lat.abs() > PROJECTED_THRESHOLD) | (long.abs() > PROJECTED_THRESHOLD)) & lat.notna() & long.notna()
+
+def reproject_lambert93(caracteristiques):
+    """
+    Converts the rows stored in Lambert-93 to WGS84, in place, with a single batched
+    transform call. Results of exactly 0 are left untouched, as the row-wise notebook did.
+    """
+    mask = projected_mask(caracteristiques['lat'], caracteristiques['long']).to_numpy()
+    if not mask.any():
+        return caracteristiques
+
+    long_wgs84, lat_wgs84 = _lambert93_transformer().transform(
+        caracteristiques['long'].to_numpy(dtype='float64')[mask],
+        caracteristiques['lat'].to_numpy(dtype='float64')[mask],
+    )
+    converted = (lat_wgs84 != 0) & (long_wgs84 != 0)
+    rows = np.flatnonzero(mask)[converted]
+    caracteristiques.iloc[rows, caracteristiques.columns.get_loc('lat')] = lat_wgs84[converted]
+    caracteristiques.iloc[rows, caracteristiques.columns.get_loc('long')] = long_wgs84[converted]
+    return caracteristiques
+
+def parse_hrmn(hrmn):
+    """
+    Splits raw accident times into integer hour and minute columns.
+
+    Handles every format found in the yearly files: HHMM integers (1745), short
+    values (5 for 00:05, 930 for 09:30), 'HH:MM' strings and floats read as '930.0'.
+    Anything else becomes a missing value.
+    """
+    if pd.api.types.is_numeric_dtype(hrmn):
+        value = hrmn.to_numpy(dtype='float64', na_value=np.nan)
+    else:
+        # Arrow string kernels: no Python call per row
+        text = pa.array(hrmn.astype('string[pyarrow]'))
+        digits = pc.replace_substring(pc.utf8_trim_whitespace(text), ':', '')
+        valid = pc.match_substring_regex(digits, r'^\d+(\.0*)?$')
+        value = pc.cast(pc.if_else(valid, digits, None), pa.float64()).to_numpy(zero_copy_only=False)
+
+    # Out of range times (99999, 2400, 1275) are missing too, checked before narrowing the type
+    with np.errstate(invalid='ignore'):
+        missing = ~((value >= 0) & (value <= 2359) & (value % 1 == 0) & (value % 100 <= 59))
+    value = np.where(missing, 0, value).astype('int16')
+    hour = pd.arrays.IntegerArray((value // 100).astype('int8'), missing)
+    minute = pd.arrays.IntegerArray((value % 100).astype('int8'), missing.copy())
+    return pd.Series(hour, index=hrmn.index), pd.Series(minute, index=hrmn.index)
+
+def clean_caracteristiques(caracteristiques_raw):
+    caracteristiques = caracteristiques_raw.copy()
+
+    # Time as integer hour and minute
+    caracteristiques['hour'], caracteristiques['minute'] = parse_hrmn(caracteristiques.pop('hrmn'))
+
+    # Department as its two first characters
+    caracteristiques["dep"] = caracteristiques["dep"].astype(str).str[:2]
+
+    # Decimal comma coordinates
+    caracteristiques['lat'] = pd.to_numeric(caracteristiques['lat'].str.replace(',', '.').replace('', pd.NA).dropna(), errors='coerce')
+    caracteristiques['long'] = pd.to_numeric(caracteristiques['long'].str.replace(',', '.').replace('', pd.NA).dropna(), errors='coerce')
+
+    reproject_lambert93(caracteristiques)
+
+    # Remove any rows that still have invalid lat/long values
+    caracteristiques.dropna(subset=['lat', 'long'], inplace=True)
+
+    caracteristiques = caracteristiques.drop(columns=[col for col in CARACTERISTIQUES_DROPPED if col in caracteristiques.columns])
+    caracteristiques['num_acc'] = caracteristiques['num_acc'].astype('int64')
+    return caracteristiques
+
+def clean_usagers(usagers_raw):
+    usagers = usagers_raw.drop(columns=[col for col in USAGERS_DROPPED if col in usagers_raw.columns])
+    usagers['num_acc'] = usagers['num_acc'].astype('int64')
+    return usagers
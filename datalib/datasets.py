@@ -0,0 +1,222 @@
+# datalib/datasets.py
+
+import os
+import hashlib
+import inspect
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import pandas as pd
+
+from datalib.timing import timed, note
+
+# Process-wide cache of cleaned datasets. Every Streamlit session runs in the same
+# process, so a dataset loaded here is parsed and cleaned once and then shared.
+# Total size of the entries loaded with other than the default arguments (a filter, a column
+# projection, a zoom level) before the least recently used ones go: every session picks its
+# own combinations, only the tables loaded with the default arguments are always kept
+DATASET_CACHE_BYTES = 512 * 1024 * 1024
+
+_cache = OrderedDict()
+_key_locks = {}
+_sources = {}
+_hashes = {}
+_stats = {}
+_lock = threading.Lock()
+
+# The frames handed out share their buffers with the cached ones: with copy-on-write, a
+# section writing to its frame gets its own copy of the written columns instead of
+# modifying the frame every other session sees
+pd.set_option('mode.copy_on_write', True)
+
+
+def _source_files(paths):
+    # Directories (e.g. partitioned datasets) stand for every file below them
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+def _sources_signature(paths):
+    # mtime and size of every source file, cheap enough to check on every rerun
+    signature = []
+    for path in _source_files(paths):
+        if not os.path.exists(path):
+            signature.append((path, None, None))
+            continue
+        stat = os.stat(path)
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+def _sources_hash(paths, signature, chunk_size=1 << 20):
+    # Memoized per signature: the sources are only read again once an mtime or size changed
+    with _lock:
+        memo = _hashes.get(paths)
+    if memo is not None and memo[0] == signature:
+        return memo[1]
+    digest = hashlib.sha1()
+    for path in _source_files(paths):
+        if not os.path.exists(path):
+            continue
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    with _lock:
+        _hashes[paths] = (signature, digest.hexdigest())
+    return digest.hexdigest()
+
+def _version(paths, signature, check_hash):
+    version = _sources_hash(paths, signature) if check_hash else hashlib.sha1(repr(signature).encode()).hexdigest()
+    return version[:12]
+
+def _counters(name):
+    return _stats.setdefault(name, {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0})
+
+def _count(name, counter):
+    with _lock:
+        _counters(name)[counter] += 1
+
+def _size(data):
+    # Imported here: datalib.memory reads this cache
+    from datalib.memory import deep_size
+    return deep_size(data)
+
+def _forget(key):
+    # The entry goes with its lock, so that the locks of the (filter, projection, zoom...) keys
+    # don't pile up; a load still holding the lock only finishes without it
+    _key_locks.pop(key, None)
+    return _cache.pop(key, None)
+
+def _evict(budget):
+    # Least recently used first, among the entries loaded with other than the default arguments
+    evictable = [key for key, entry in _cache.items() if entry['bytes'] is not None]
+    total = sum(_cache[key]['bytes'] for key in evictable)
+    for key in evictable:
+        if total <= budget:
+            break
+        total -= _forget(key)['bytes']
+        _counters(key[0])['evictions'] += 1
+
+def _drop_stale(name, paths, signature, check_hash):
+    # Every entry of the dataset loaded from other sources goes at once, not only when its own
+    # arguments are asked for again
+    with _lock:
+        stale = [key for key, entry in _cache.items() if key[0] == name and entry['signature'] != signature]
+    if not stale:
+        return
+    content_hash = _sources_hash(paths, signature) if check_hash else None
+    with _lock:
+        for key in stale:
+            entry = _cache.get(key)
+            if entry is None:
+                continue
+            if content_hash is not None and entry['hash'] == content_hash:
+                entry['signature'] = signature
+            else:
+                _forget(key)
+                _counters(name)['invalidations'] += 1
+
+def _share(data):
+    # Hand out a shallow copy: sections adding columns must not leak them into the cache,
+    # and copy-on-write keeps them from writing to the cached columns
+    if isinstance(data, pd.DataFrame):
+        return data.copy(deep=False)
+    return data
+
+def cached_dataset(name, *paths, check_hash=True, budget=None):
+    """
+    Caches the result of a dataset loader once per process.
+
+    The entries are invalidated, all of them together, when the modification time or size
+    of one of the source files changes. With check_hash, a changed mtime only triggers a reload when the
+    content hash of the sources changed too (e.g. a file that was merely touched).
+
+    The entry loaded with the default arguments is kept; the entries loaded with other
+    arguments are evicted least recently used first once their deep size exceeds the
+    budget (DATASET_CACHE_BYTES by default).
+
+    :param name: Name of the dataset, used for the statistics and the version.
+    :param paths: Source files the loader reads.
+    :param check_hash: Confirm mtime changes with a content hash before reloading.
+    :param budget: Memory budget in bytes, shared by every evictable entry.
+    """
+    def decorator(loader):
+        parameters = inspect.signature(loader)
+        defaults = {parameter.name: parameter.default for parameter in parameters.parameters.values()}
+        with _lock:
+            _sources[name] = (paths, check_hash)
+
+        @wraps(loader)
+        def wrapper(*args, **kwargs):
+            # Same entry whether an argument is passed by position, by keyword or left to its default
+            arguments = parameters.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            key = (name, tuple(arguments.arguments.items()))
+            evictable = any(value != defaults[parameter] for parameter, value in arguments.arguments.items())
+            with _lock:
+                key_lock = _key_locks.setdefault(key, threading.Lock())
+
+            # One lock per entry, so concurrent sessions wait for a single load
+            with timed('dataset', name), key_lock:
+                signature = _sources_signature(paths)
+                _drop_stale(name, paths, signature, check_hash)
+                with _lock:
+                    entry = _cache.get(key)
+                    if entry is not None:
+                        _cache.move_to_end(key)
+
+                if entry is not None:
+                    _count(name, 'hits')
+                    note('cache hit')
+                    return _share(entry['data'])
+
+                _count(name, 'misses')
+                note('cache miss')
+                data = loader(*args, **kwargs)
+                content_hash = _sources_hash(paths, signature) if check_hash else None
+                size = _size(data) if evictable else None
+                limit = DATASET_CACHE_BYTES if budget is None else budget
+                with _lock:
+                    if size is None or size <= limit:
+                        _cache[key] = {'signature': signature, 'hash': content_hash, 'data': data, 'bytes': size}
+                        _evict(limit)
+                    else:
+                        _forget(key)
+                return _share(data)
+
+        return wrapper
+    return decorator
+
+def dataset_version(name):
+    """
+    Returns a short token identifying the current source data of a dataset, or None for an
+    unknown name. Read from the sources, so it is up to date before the dataset is loaded again.
+    """
+    with _lock:
+        sources = _sources.get(name)
+    if sources is None:
+        return None
+    paths, check_hash = sources
+    return _version(paths, _sources_signature(paths), check_hash)
+
+def cache_stats():
+    """Returns the hit, miss, invalidation and eviction counters of every cached dataset."""
+    with _lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
+
+def cached_entries():
+    """Returns (name, arguments, data) for every loaded entry, arguments as a {parameter: value} dict."""
+    with _lock:
+        return [(key[0], dict(key[1]), entry['data']) for key, entry in _cache.items()]
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+        _key_locks.clear()
+        _hashes.clear()
+        _stats.clear()
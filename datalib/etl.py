@@ -0,0 +1,157 @@
+# datalib/etl.py
+# Incremental build of the cleaned accidents dataset from the yearly data.gouv.fr files.
+# python -m datalib.etl [--jobs N] [--force] [--years 2021 2022]
+
+import os
+import re
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from config import DATA_DIR
+from datalib.accidents import CARACTERISTIQUES_PATH, USAGERS_PATH, compact_caracteristiques, compact_usagers
+from datalib.cleaning import clean_caracteristiques, clean_usagers
+
+RAW_DIR = os.path.join(DATA_DIR, 'accidents', 'raw')
+MANIFEST_PATH = os.path.join(DATA_DIR, 'accidents', 'etl_manifest.json')
+
+# Bump whenever the cleaning or the file layout changes, so that every year is rebuilt
+ETL_VERSION = 4
+
+# Rows are sorted so that the row group statistics let department and accident id filters
+# skip most of a year file (see datalib.accidents.dataset_filter)
+PARTITION_SORT = {
+    'caracteristiques': ['dep', 'num_acc'],
+    'usagers': ['num_acc'],
+}
+ROW_GROUP_SIZE = 10_000
+
+# Yearly file names, e.g. caracteristiques_2005.csv, caracteristiques-2019.csv, carcteristiques-2022.csv
+RAW_PATTERNS = {
+    'caracteristiques': re.compile(r'^car\w*?[-_](\d{4})\.csv$'),
+    'usagers': re.compile(r'^usagers[-_](\d{4})\.csv$'),
+}
+
+# Columns read as text, whatever their format in a given year
+TEXT_COLUMNS = {
+    'caracteristiques': ['dep', 'lat', 'long'],
+    'usagers': [],
+}
+
+# Columns named differently in some years (carcteristiques-2022.csv calls the accident id Accident_Id)
+RENAMED_COLUMNS = {'accident_id': 'num_acc'}
+
+
+def find_raw_files(raw_dir=RAW_DIR):
+    """Returns {year: {'caracteristiques': path, 'usagers': path}} for the yearly raw files."""
+    years = {}
+    for name in sorted(os.listdir(raw_dir)):
+        for table, pattern in RAW_PATTERNS.items():
+            match = pattern.match(name.lower())
+            if match:
+                years.setdefault(int(match.group(1)), {})[table] = os.path.join(raw_dir, name)
+    return {year: files for year, files in years.items() if len(files) == len(RAW_PATTERNS)}
+
+def read_raw(path, table):
+    # Yearly files differ in separator (',', ';' or tab) and encoding (UTF-8 or latin1)
+    with open(path, 'rb') as f:
+        header = f.readline().decode('latin1')
+    sep = max([',', ';', '\t'], key=header.count)
+    dtype = {column: str for column in TEXT_COLUMNS[table]}
+    try:
+        data = pd.read_csv(path, sep=sep, dtype=dtype, encoding='utf-8', low_memory=False)
+    except UnicodeDecodeError:
+        data = pd.read_csv(path, sep=sep, dtype=dtype, encoding='latin1', low_memory=False)
+    data.columns = [column.strip().strip('"').lower() for column in data.columns]
+    return data.rename(columns=RENAMED_COLUMNS)
+
+def write_partition(data, root, year, sort_by=None):
+    # One directory per year (hive layout, annee=YYYY), swapped in atomically
+    directory = os.path.join(root, f'annee={year}')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'part-0.parquet')
+    # Readers skip the files starting with '_', so a partial or leftover temporary file is never read
+    temporary = os.path.join(directory, '_part-0.parquet.tmp')
+    data = data.drop(columns=['annee'])
+    if sort_by:
+        data = data.sort_values(sort_by, kind='stable')
+    # Plain strings rather than dictionaries, so that filters can use the row group statistics
+    data = data.astype({column: object for column in data.select_dtypes('category').columns})
+    data.to_parquet(temporary, index=False, row_group_size=ROW_GROUP_SIZE)
+    os.replace(temporary, path)
+    return path
+
+def write_partitions(data, root, sort_by=None):
+    for year, frame in data.groupby('annee'):
+        write_partition(frame, root, int(year), sort_by)
+
+def process_year(year, files, caracteristiques_root=CARACTERISTIQUES_PATH, usagers_root=USAGERS_PATH):
+    caracteristiques = read_raw(files['caracteristiques'], 'caracteristiques')
+    caracteristiques = clean_caracteristiques(caracteristiques.drop(columns=['an', 'annee'], errors='ignore'))
+    caracteristiques['annee'] = year
+    write_partition(compact_caracteristiques(caracteristiques), caracteristiques_root, year, PARTITION_SORT['caracteristiques'])
+
+    usagers = clean_usagers(read_raw(files['usagers'], 'usagers').drop(columns=['annee'], errors='ignore'))
+    usagers['annee'] = year
+    write_partition(compact_usagers(usagers), usagers_root, year, PARTITION_SORT['usagers'])
+    return year
+
+def inputs_hash(files):
+    digest = hashlib.sha1(str(ETL_VERSION).encode())
+    for table in sorted(files):
+        with open(files[table], 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def run(raw_dir=RAW_DIR, jobs=None, force=False, years=None):
+    """
+    Cleans every yearly raw file whose content changed since the last run, in parallel,
+    and returns the list of years that were rebuilt.
+    """
+    raw_files = find_raw_files(raw_dir)
+    if years:
+        raw_files = {year: files for year, files in raw_files.items() if year in years}
+
+    manifest = load_manifest()
+    hashes = {year: inputs_hash(files) for year, files in raw_files.items()}
+    outdated = [
+        year for year in sorted(raw_files)
+        if force
+        or manifest.get(str(year)) != hashes[year]
+        or not os.path.isdir(os.path.join(CARACTERISTIQUES_PATH, f'annee={year}'))
+        or not os.path.isdir(os.path.join(USAGERS_PATH, f'annee={year}'))
+    ]
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for year in executor.map(process_year, outdated, [raw_files[year] for year in outdated]):
+            manifest[str(year)] = hashes[year]
+            save_manifest(manifest)
+            print(f"{year}: done")
+    return outdated
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the cleaned, year-partitioned accidents dataset.')
+    parser.add_argument('--raw', default=RAW_DIR, help='Directory of the yearly raw CSV files')
+    parser.add_argument('--jobs', type=int, default=None, help='Worker processes (default: one per core)')
+    parser.add_argument('--force', action='store_true', help='Rebuild every year, changed or not')
+    parser.add_argument('--years', type=int, nargs='*', help='Only process these years')
+    args = parser.parse_args()
+
+    rebuilt = run(args.raw, args.jobs, args.force, args.years)
+    print(f"{len(rebuilt)} year(s) rebuilt" + (f": {', '.join(map(str, rebuilt))}" if rebuilt else ", everything is up to date"))
@@ -0,0 +1,80 @@
+# datalib/figures.py
+# Process-wide cache of built Plotly figures, so that reruns and other sessions reuse them.
+
+import inspect
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from datalib.datasets import dataset_version
+from datalib.timing import timed, note
+
+# Total size of the cached figures (as serialized JSON) before the least recently used ones go
+FIGURE_CACHE_BYTES = 64 * 1024 * 1024
+
+_figures = OrderedDict()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'bytes': 0}
+_lock = threading.Lock()
+
+
+def _evict(budget):
+    while _figures and _stats['bytes'] > budget:
+        _, (_, size) = _figures.popitem(last=False)
+        _stats['bytes'] -= size
+        _stats['evictions'] += 1
+
+def cached_figure(name, *datasets, budget=None):
+    """
+    Caches the figures built by a function, keyed on its arguments and on the versions of
+    the datasets it reads (see datalib.datasets.dataset_version), so that a figure is built
+    again only when its data or its parameters change.
+
+    Entries are evicted least recently used first once their serialized size exceeds the
+    budget (FIGURE_CACHE_BYTES by default). Cached figures are shared: callers must not
+    modify them.
+
+    :param name: Name of the figure, part of the key.
+    :param datasets: Names of the cached datasets the figure is built from.
+    :param budget: Memory budget in bytes, shared by every cached figure.
+    """
+    def decorator(build):
+        parameters = inspect.signature(build)
+
+        @wraps(build)
+        def wrapper(*args, **kwargs):
+            arguments = parameters.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            arguments = tuple(arguments.arguments.items())
+            key = (name, tuple(dataset_version(dataset) for dataset in datasets), arguments)
+            with _lock:
+                entry = _figures.get(key)
+                if entry is not None:
+                    _figures.move_to_end(key)
+                    _stats['hits'] += 1
+                    return entry[0]
+
+            with timed('figure', name):
+                note('cache miss')
+                fig = build(*args, **kwargs)
+            size = len(fig.to_json())
+            limit = FIGURE_CACHE_BYTES if budget is None else budget
+            with _lock:
+                _stats['misses'] += 1
+                if size <= limit and key not in _figures:
+                    _figures[key] = (fig, size)
+                    _stats['bytes'] += size
+                    _evict(limit)
+            return fig
+
+        return wrapper
+    return decorator
+
+def figure_cache_stats():
+    """Returns the hit, miss and eviction counters, the number of figures and their size in bytes."""
+    with _lock:
+        return {**_stats, 'figures': len(_figures)}
+
+def clear_figures():
+    with _lock:
+        _figures.clear()
+        _stats.update(hits=0, misses=0, evictions=0, bytes=0)
@@ -0,0 +1,91 @@
+# datalib/geo.py
+# Geohash binning of point data, so maps draw one marker per cell instead of one per row.
+
+import numpy as np
+import pandas as pd
+
+from datalib.timing import timed_stage
+
+GEOHASH_ALPHABET = np.array(list('0123456789bcdefghjkmnpqrstuvwxyz'))
+
+# Upper bound on the markers sent to a map, whatever the number of rows
+MAX_CELLS = 5000
+
+
+def _cell_bits(precision):
+    # A geohash of n characters splits longitude on ceil(5n/2) bits and latitude on floor(5n/2)
+    bits = 5 * precision
+    return (bits + 1) // 2, bits // 2
+
+def precision_for_zoom(zoom):
+    """
+    Geohash precision whose cells are a few pixels wide at a given map zoom level
+    (one 256px tile spans 360 / 2**zoom degrees of longitude).
+    """
+    return int(np.clip(np.ceil(2 * (zoom + 5) / 5), 1, 12))
+
+def geohash_cells(lat, lon, precision):
+    """Integer geohash cell of every point (-1 where a coordinate is missing or out of range)."""
+    lon_bits, lat_bits = _cell_bits(precision)
+    lat = np.asarray(lat, dtype='float64')
+    lon = np.asarray(lon, dtype='float64')
+    valid = (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+    lat_index = np.clip(((lat + 90) / 180 * 2 ** lat_bits), 0, 2 ** lat_bits - 1)
+    lon_index = np.clip(((lon + 180) / 360 * 2 ** lon_bits), 0, 2 ** lon_bits - 1)
+    cells = np.nan_to_num(lat_index).astype('int64') * 2 ** lon_bits + np.nan_to_num(lon_index).astype('int64')
+    return np.where(valid, cells, -1)
+
+def cell_centers(cells, precision):
+    lon_bits, lat_bits = _cell_bits(precision)
+    lat_index, lon_index = np.divmod(cells, 2 ** lon_bits)
+    return (lat_index + 0.5) * 180 / 2 ** lat_bits - 90, (lon_index + 0.5) * 360 / 2 ** lon_bits - 180
+
+def geohash_strings(cells, precision):
+    # Interleave the longitude and latitude bits (longitude first), then base32 encode
+    lon_bits, lat_bits = _cell_bits(precision)
+    lat_index, lon_index = np.divmod(np.asarray(cells, dtype='int64'), 2 ** lon_bits)
+    code = np.zeros(len(lat_index), dtype='int64')
+    for bit in range(5 * precision):
+        if bit % 2 == 0:
+            value = (lon_index >> (lon_bits - 1 - bit // 2)) & 1
+        else:
+            value = (lat_index >> (lat_bits - 1 - bit // 2)) & 1
+        code = (code << 1) | value
+    characters = [GEOHASH_ALPHABET[(code >> (5 * (precision - 1 - i))) & 31] for i in range(precision)]
+    return np.array([''.join(chars) for chars in zip(*characters)], dtype=object)
+
+@timed_stage('aggregate')
+def aggregate_cells(data, lat, lon, precision, columns=(), max_cells=MAX_CELLS):
+    """
+    Counts the rows of each geohash cell of the (lat, lon) points, along with the mean of
+    each of the given columns. The precision is lowered until at most max_cells cells are
+    left, so the result stays small however many rows there are.
+
+    Returns a DataFrame with geohash, lat, lon (cell center), count, the column means and
+    the precision actually used.
+    """
+    while True:
+        cells = geohash_cells(data[lat].to_numpy(), data[lon].to_numpy(), precision)
+        valid = cells >= 0
+        unique, inverse = np.unique(cells[valid], return_inverse=True)
+        if len(unique) <= max_cells or precision == 1:
+            break
+        precision -= 1
+
+    counts = np.bincount(inverse, minlength=len(unique))
+    center_lat, center_lon = cell_centers(unique, precision)
+    result = pd.DataFrame({
+        'geohash': geohash_strings(unique, precision),
+        lat: center_lat,
+        lon: center_lon,
+        'count': counts,
+    })
+    for column in columns:
+        values = data[column].to_numpy(dtype='float64', na_value=np.nan)[valid]
+        known = ~np.isnan(values)
+        sums = np.bincount(inverse[known], weights=values[known], minlength=len(unique))
+        known_counts = np.bincount(inverse[known], minlength=len(unique))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result[column] = sums / known_counts
+    result['precision'] = precision
+    return result
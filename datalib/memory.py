@@ -0,0 +1,145 @@
+# datalib/memory.py
+# Memory accounting: deep size of the cached datasets and per-session objects, process RSS over time.
+
+import time
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import psutil
+from pympler import asizeof
+
+from datalib.datasets import cache_stats, cached_entries
+from datalib.figures import figure_cache_stats
+
+# RSS sampled every RSS_INTERVAL seconds, the last RSS_SAMPLES samples kept (one hour)
+RSS_INTERVAL = 5.0
+RSS_SAMPLES = 720
+# Sessions that have not rerun for this many seconds are forgotten
+SESSION_TTL = 3600
+
+_rss = deque(maxlen=RSS_SAMPLES)
+_sampler = None
+_sessions = {}
+_lock = threading.Lock()
+
+
+def deep_size(obj, seen=None):
+    """
+    Bytes held by an object and everything it references: pandas objects through
+    memory_usage(deep=True), numpy arrays through their buffer, containers and plain
+    objects (e.g. RiskCube, SpatialIndex) member by member, anything else with Pympler.
+    Objects reached twice are counted once.
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        # A view holds on to the array it was taken from
+        return deep_size(obj.base, seen) if isinstance(obj.base, np.ndarray) else obj.nbytes
+    if isinstance(obj, dict):
+        return asizeof.basicsize(obj) + sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset, deque)):
+        return asizeof.basicsize(obj) + sum(deep_size(item, seen) for item in obj)
+    if hasattr(obj, '__dict__') and not isinstance(obj, type):
+        return asizeof.basicsize(obj) + deep_size(vars(obj), seen)
+    return asizeof.asizeof(obj)
+
+def column_sizes(data):
+    """Bytes per column of a DataFrame, largest first."""
+    return data.memory_usage(deep=True, index=False).sort_values(ascending=False)
+
+def _describe(arguments, limit=60):
+    text = ', '.join(f'{name}={value!r}' for name, value in arguments.items() if value is not None)
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+def dataset_sizes():
+    """
+    One row per cached dataset entry (see datalib.datasets.cached_dataset): its loader
+    arguments, type, rows, deep size in bytes and largest columns, largest entries first.
+    """
+    rows = []
+    for name, arguments, data in cached_entries():
+        row = {'dataset': name, 'arguments': _describe(arguments), 'type': type(data).__name__,
+               'rows': len(data) if isinstance(data, (pd.DataFrame, pd.Series)) else None,
+               'bytes': deep_size(data), 'largest columns': ''}
+        if isinstance(data, pd.DataFrame) and len(data.columns):
+            row['largest columns'] = ', '.join(f'{column} {size / 1e6:.1f} MB' for column, size in column_sizes(data).head(3).items())
+        rows.append(row)
+    columns = ['dataset', 'arguments', 'type', 'rows', 'bytes', 'largest columns']
+    data = pd.DataFrame(rows, columns=columns).astype({'rows': 'Int64'})
+    return data.sort_values('bytes', ascending=False, ignore_index=True)
+
+def rss_bytes():
+    return psutil.Process().memory_info().rss
+
+def sample_rss():
+    with _lock:
+        _rss.append((time.time(), rss_bytes()))
+
+def start_rss_sampler(interval=RSS_INTERVAL):
+    """Samples the process RSS every interval seconds in a daemon thread, started once per process."""
+    global _sampler
+    with _lock:
+        if _sampler is not None:
+            return
+
+        def sample():
+            while True:
+                sample_rss()
+                time.sleep(interval)
+
+        _sampler = threading.Thread(target=sample, name='rss-sampler', daemon=True)
+        _sampler.start()
+
+def rss_history():
+    """The RSS samples as a frame of (time, rss_mb)."""
+    with _lock:
+        samples = list(_rss)
+    return pd.DataFrame({
+        'time': pd.to_datetime([at for at, _ in samples], unit='s'),
+        'rss_mb': [rss / 1e6 for _, rss in samples],
+    })
+
+def record_session(session_id, objects):
+    """Records the deep size of the objects a session retains (e.g. its session_state), per object."""
+    sizes = {name: deep_size(value) for name, value in objects.items()}
+    now = time.time()
+    with _lock:
+        for expired in [key for key, record in _sessions.items() if now - record['updated'] > SESSION_TTL]:
+            del _sessions[expired]
+        _sessions[session_id] = {'updated': now, 'objects': len(sizes), 'bytes': sum(sizes.values()),
+                                 'largest': max(sizes, key=sizes.get) if sizes else ''}
+
+def session_sizes():
+    """The last recorded size of every session, largest first."""
+    with _lock:
+        sessions = {session_id: dict(record) for session_id, record in _sessions.items()}
+    data = pd.DataFrame.from_dict(sessions, orient='index', columns=['updated', 'objects', 'bytes', 'largest'])
+    data['updated'] = pd.to_datetime(data['updated'], unit='s')
+    return data.rename_axis('session').sort_values('bytes', ascending=False)
+
+def cache_counters():
+    """Hit, miss, invalidation and eviction counters of every cached dataset, one row each."""
+    columns = ['hits', 'misses', 'invalidations', 'evictions']
+    return pd.DataFrame.from_dict(cache_stats(), orient='index', columns=columns).rename_axis('dataset')
+
+def memory_report():
+    """Summary of the above as plain values, for JSON output (see benchmarks.suite)."""
+    datasets = dataset_sizes()
+    return {
+        'rss_mb': rss_bytes() / 1e6,
+        'datasets_mb': datasets['bytes'].sum() / 1e6,
+        'figures_mb': figure_cache_stats()['bytes'] / 1e6,
+        'datasets': [
+            {'dataset': row['dataset'], 'arguments': row['arguments'], 'mb': row['bytes'] / 1e6,
+             'rows': None if pd.isna(row['rows']) else int(row['rows'])}
+            for row in datasets.to_dict('records')
+        ],
+    }
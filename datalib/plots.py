@@ -1,20 +1,143 @@
+import numpy as np
+import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
+
+from datalib.sampling import stratified_positions
+from datalib.timing import timed_stage
+
+# Above this many rows, scatter plots are binned or downsampled before being sent to the browser
+SCATTER_MAX_POINTS = 20_000
+DENSITY_BINS = 200
+SAMPLE_BINS = 50
+
+@timed_stage('figure')
+def histogram_with_stats(data, column, title, nbins=50, log=False):
+    """
+    Histogram of a column with its quartiles (dashed) and mean (solid).
+
+    The bins are counted here with np.histogram, so the figure only carries nbins edges and
+    counts instead of every value. With log=True the bins are spaced logarithmically over the
+    positive values, on a log axis. Quartiles and mean are always those of the whole column.
+    """
+    values = data[column].to_numpy(dtype='float64', na_value=np.nan)
+    values = values[~np.isnan(values)]
 
-def histogram_with_stats(data, column, title):
     # Calculate quartiles and mean
-    quartiles = data[column].quantile([0.25, 0.5, 0.75])
-    mean = data[column].mean()
+    quartiles = np.percentile(values, [25, 50, 75]) if len(values) else np.full(3, np.nan)
+    mean = values.mean() if len(values) else np.nan
+
+    # Count the bins
+    if log:
+        positive = values[values > 0]
+        low, high = (positive.min(), positive.max()) if len(positive) else (1, 10)
+        edges = np.geomspace(low, high if high > low else low * 10, nbins + 1)
+        counts, edges = np.histogram(positive, bins=edges)
+        # On a log axis, bar widths and shape positions are in log10 units
+        position, widths = np.log10, np.diff(np.log10(edges))
+    else:
+        counts, edges = np.histogram(values, bins=nbins)
+        position, widths = (lambda x: x), np.diff(edges)
 
     # Create the histogram
-    fig = px.histogram(data, x=column, nbins=50, title=title)
+    fig = go.Figure(go.Bar(
+        x=edges[:-1], y=counts, width=widths, offset=0,
+        customdata=edges[1:],
+        hovertemplate=f'{column}: %{{x:.4g}} - %{{customdata:.4g}}<br>count: %{{y}}<extra></extra>',
+    ))
+    fig.update_layout(title=title, xaxis_title=column, yaxis_title='count', bargap=0)
+    if log:
+        fig.update_xaxes(type='log')
 
     # Add quartiles and mean lines
-    fig.add_shape(type="line", x0=quartiles[0.25], x1=quartiles[0.25], y0=0, y1=1, 
-                  line=dict(color="green", dash="dash"), xref='x', yref='paper')
-    fig.add_shape(type="line", x0=quartiles[0.5], x1=quartiles[0.5], y0=0, y1=1, 
-                  line=dict(color="blue", dash="dash"), xref='x', yref='paper')
-    fig.add_shape(type="line", x0=quartiles[0.75], x1=quartiles[0.75], y0=0, y1=1, 
-                  line=dict(color="green", dash="dash"), xref='x', yref='paper')
-    fig.add_shape(type="line", x0=mean, x1=mean, y0=0, y1=1, 
-                  line=dict(color="red", dash="solid"), xref='x', yref='paper')
+    for value, color, dash in [(quartiles[0], "green", "dash"), (quartiles[1], "blue", "dash"),
+                               (quartiles[2], "green", "dash"), (mean, "red", "solid")]:
+        if np.isnan(value) or (log and value <= 0):
+            continue
+        fig.add_shape(type="line", x0=position(value), x1=position(value), y0=0, y1=1,
+                      line=dict(color=color, dash=dash), xref='x', yref='paper')
     return fig
+
+def _numeric_values(series):
+    # Float values of a numeric, boolean or datetime column (datetimes as nanoseconds), None otherwise
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = series.to_numpy(dtype='datetime64[ns]').view('int64').astype('float64')
+        values[series.isna().to_numpy()] = np.nan
+        return values
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype='float64', na_value=np.nan)
+    return None
+
+def _axis_values(series, values):
+    # Bin centers back in the column's own unit
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return pd.to_datetime(values.astype('int64'))
+    return values
+
+def _bin_index(series, bins):
+    # Equal-width bin of each row for numeric columns, category code otherwise; missing values get their own bin
+    values = _numeric_values(series)
+    if values is None:
+        codes, _ = pd.factorize(series)
+        return np.where(codes < 0, codes.max(initial=0) + 1, codes)
+    missing = np.isnan(values)
+    if missing.all():
+        return np.zeros(len(values), dtype='int64')
+    low, high = np.nanmin(values), np.nanmax(values)
+    scaled = (values - low) / (high - low) * bins if high > low else np.zeros(len(values))
+    index = np.clip(np.nan_to_num(scaled), 0, bins - 1).astype('int64')
+    return np.where(missing, bins, index)
+
+def grid_sample(data, x, y, n, bins=SAMPLE_BINS, seed=0):
+    """
+    Deterministic sample of about n rows, stratified on a bins x bins grid of the two columns
+    (see datalib.sampling.stratified_positions): each occupied cell keeps its share of the rows,
+    and at least one, so sparse regions and outliers stay visible.
+    """
+    if len(data) <= n:
+        return data
+    cells = _bin_index(data[x], bins) * (bins + 2) + _bin_index(data[y], bins)
+    return data.iloc[stratified_positions(cells, n, seed)]
+
+@timed_stage('figure')
+def density_heatmap(data, x, y, title, bins=DENSITY_BINS):
+    # 2D histogram computed here, so only bins x bins counts are sent to the browser
+    xs, ys = _numeric_values(data[x]), _numeric_values(data[y])
+    valid = ~(np.isnan(xs) | np.isnan(ys))
+    if not valid.any():
+        return px.scatter(title=title)
+    counts, x_edges, y_edges = np.histogram2d(xs[valid], ys[valid], bins=bins)
+    fig = go.Figure(go.Heatmap(
+        x=_axis_values(data[x], (x_edges[:-1] + x_edges[1:]) / 2),
+        y=_axis_values(data[y], (y_edges[:-1] + y_edges[1:]) / 2),
+        z=np.where(counts.T > 0, counts.T, np.nan),
+        colorscale='Viridis',
+        colorbar=dict(title='Rows'),
+        hovertemplate=f'{x}: %{{x}}<br>{y}: %{{y}}<br>Rows: %{{z}}<extra></extra>',
+    ))
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y)
+    return fig
+
+@timed_stage('figure')
+def scatter_plot(data, x, y, title, mode='density', max_points=SCATTER_MAX_POINTS):
+    """
+    Scatter plot of two columns that stays light on large data: up to max_points rows are plotted
+    as is, above that the rows are binned into a density heatmap (mode='density', numeric and
+    datetime columns only) or downsampled with grid_sample (mode='sample').
+    """
+    if len(data) <= max_points:
+        return px.scatter(data, x=x, y=y, title=title)
+    if mode == 'density' and _numeric_values(data[x]) is not None and _numeric_values(data[y]) is not None:
+        return density_heatmap(data, x, y, title)
+    sample = grid_sample(data, x, y, max_points)
+    return px.scatter(sample, x=x, y=y, title=f'{title} ({len(sample):,} of {len(data):,} rows)')
+
+def scatter_summary(data, x, y):
+    # Statistics of the full data, whatever is actually drawn
+    xs, ys = _numeric_values(data[x]), _numeric_values(data[y])
+    summary = {'rows': int((data[x].notna() & data[y].notna()).sum()), 'correlation': None}
+    if xs is not None and ys is not None:
+        valid = ~(np.isnan(xs) | np.isnan(ys))
+        if valid.sum() > 1 and xs[valid].std() > 0 and ys[valid].std() > 0:
+            summary['correlation'] = float(np.corrcoef(xs[valid], ys[valid])[0, 1])
+    return summary
@@ -0,0 +1,211 @@
+# datalib/risk.py
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from datalib.accidents import WEATHER_MAP, TRIP_PURPOSE_MAP
+
+AGE_BINS = [0, 14, 17, 24, 34, 44, 54, 64, 74, 100]
+AGE_GROUPS = ['0-14', '15-17', '18-24', '25-34', '35-44', '45-54', '55-64', '65-74', '75+']
+
+# Selector value -> code, for the dimensions whose selector does not show the code itself
+GENDER_CODES = {'Male': 1, 'Female': 2}
+AREA_CODES = {'Urban': 2, 'Rural': 1}
+
+# Killed or hospitalized (grav)
+SEVERE_CODES = [2, 3]
+
+# Columns RiskIndex and RiskCube read from each table
+RISK_COLUMNS = {
+    'caracteristiques': ('num_acc', 'hour', 'dep', 'agg', 'atm'),
+    'usagers': ('num_acc', 'sexe', 'an_nais', 'trajet', 'grav'),
+}
+
+# Weight of each dimension in the total risk score
+RISK_WEIGHTS = {
+    'hour': 0.15,
+    'gender': 0.15,
+    'department': 0.15,
+    'urban_rural': 0.15,
+    'weather': 0.15,
+    'age': 0.15,
+    'trip_reason': 0.1,
+}
+
+
+def age_groups(an_nais, year=None):
+    year = year or pd.Timestamp.today().year
+    return pd.cut(year - an_nais, bins=AGE_BINS, labels=AGE_GROUPS)
+
+def _normalized_risks(values):
+    # Frequency of each value, rescaled between the least and the most frequent one
+    frequencies = values.value_counts(normalize=True, dropna=True, sort=False)
+    spread = frequencies.max() - frequencies.min()
+    risks = (frequencies - frequencies.min()) / spread if spread else frequencies * 0
+    # Unknown values and "Any" get the average frequency
+    return dict(zip(risks.index.tolist(), risks.tolist())), float(frequencies.mean())
+
+
+class RiskIndex:
+    """
+    Normalized accident frequencies of every risk dimension, computed once so that
+    scoring a profile is a handful of dictionary lookups.
+    """
+
+    def __init__(self, caracteristiques, usagers):
+        self.risks = {}
+        self.defaults = {}
+        dimensions = {
+            'hour': caracteristiques['hour'],
+            'gender': usagers['sexe'],
+            'department': caracteristiques['dep'].dropna().astype(str),
+            'urban_rural': caracteristiques['agg'],
+            'weather': caracteristiques['atm'].map(WEATHER_MAP),
+            'age': age_groups(usagers['an_nais']),
+            'trip_reason': usagers['trajet'].map(TRIP_PURPOSE_MAP),
+        }
+        for dimension, values in dimensions.items():
+            self.risks[dimension], self.defaults[dimension] = _normalized_risks(values)
+
+    def _key(self, dimension, value):
+        if dimension == 'gender':
+            return GENDER_CODES.get(value)
+        if dimension == 'urban_rural':
+            return AREA_CODES.get(value)
+        return value
+
+    def risk(self, dimension, value):
+        key = self._key(dimension, value)
+        return self.risks[dimension].get(key, self.defaults[dimension])
+
+    def score(self, **profile):
+        """
+        Returns the risk of each dimension of a profile and the weighted total, e.g.
+        score(hour=17, gender='Male', department='75', urban_rural='Urban', weather='Normal', age='25-34', trip_reason='Leisure').
+        Missing dimensions count as "Any".
+        """
+        risks = {dimension: self.risk(dimension, profile.get(dimension, 'Any')) for dimension in RISK_WEIGHTS}
+        risks['total'] = sum(RISK_WEIGHTS[dimension] * risks[dimension] for dimension in RISK_WEIGHTS)
+        return risks
+
+    def score_many(self, profiles):
+        """Scores every row of a DataFrame of profiles (one column per dimension) at once."""
+        scores = pd.DataFrame(index=profiles.index)
+        for dimension in RISK_WEIGHTS:
+            if dimension not in profiles.columns:
+                scores[dimension] = self.defaults[dimension]
+                continue
+            keys = profiles[dimension]
+            if dimension == 'gender':
+                keys = keys.map(GENDER_CODES)
+            elif dimension == 'urban_rural':
+                keys = keys.map(AREA_CODES)
+            scores[dimension] = keys.map(self.risks[dimension]).astype('float64').fillna(self.defaults[dimension])
+        scores['total'] = sum(RISK_WEIGHTS[dimension] * scores[dimension] for dimension in RISK_WEIGHTS)
+        return scores
+
+
+class RiskCube:
+    """
+    Sparse count cube of accident victims over hour x gender x department x urban/rural
+    x weather x age group x trip purpose.
+
+    Only the non-empty cells are stored, as one small-integer code array per dimension
+    plus the victim and severe-injury counts, so memory is bounded by the number of
+    victims rather than by the product of the dimension sizes. Any dimension left out
+    of a query (or set to "Any") is summed over.
+    """
+
+    def __init__(self, caracteristiques, usagers):
+        accidents = caracteristiques[['num_acc', 'hour', 'dep', 'agg', 'atm']]
+        victims = usagers[['num_acc', 'sexe', 'an_nais', 'trajet', 'grav']].merge(accidents, on='num_acc', how='inner')
+
+        departments = victims['dep'].astype('category').cat
+        self.labels = {
+            'gender': GENDER_CODES,
+            'department': {str(label): code for code, label in enumerate(departments.categories)},
+            'urban_rural': AREA_CODES,
+            'weather': {label: code for code, label in WEATHER_MAP.items()},
+            'age': {label: code for code, label in enumerate(AGE_GROUPS)},
+            'trip_reason': {label: code for code, label in TRIP_PURPOSE_MAP.items()},
+        }
+        codes = {
+            'hour': victims['hour'],
+            'gender': victims['sexe'],
+            'department': pd.Series(departments.codes, index=victims.index),
+            'urban_rural': victims['agg'],
+            'weather': victims['atm'],
+            'age': pd.Series(age_groups(victims['an_nais']).cat.codes, index=victims.index),
+            'trip_reason': victims['trajet'],
+        }
+        codes = {dimension: values.fillna(-1).to_numpy(dtype='int64') for dimension, values in codes.items()}
+
+        # One mixed-radix key per victim, then one cell per distinct key
+        keys = np.zeros(len(victims), dtype='int64')
+        radixes = {}
+        for dimension, values in codes.items():
+            radixes[dimension] = int(values.max(initial=0)) + 2
+            keys = keys * radixes[dimension] + (values + 1)
+        cells, inverse = np.unique(keys, return_inverse=True)
+        severe = victims['grav'].isin(SEVERE_CODES).to_numpy(dtype='int64')
+
+        self.count = np.bincount(inverse, minlength=len(cells)).astype('int32')
+        self.severe = np.bincount(inverse, weights=severe, minlength=len(cells)).astype('int32')
+        self.cells = {}
+        for dimension in reversed(list(codes)):
+            self.cells[dimension] = (cells % radixes[dimension] - 1).astype('int16')
+            cells = cells // radixes[dimension]
+        self.total = int(self.count.sum())
+        self._memo = {}
+        # The cube is shared by every session
+        self._memo_lock = threading.Lock()
+
+    def _code(self, dimension, value):
+        if value is None or value == 'Any':
+            return None
+        if dimension == 'hour':
+            return int(value)
+        # Unknown selections count as "Any", as in RiskIndex
+        return self.labels[dimension].get(value)
+
+    def _counts(self, profile):
+        key = tuple(sorted(profile.items()))
+        with self._memo_lock:
+            counts = self._memo.get(key)
+        if counts is None:
+            mask = np.ones(len(self.count), dtype=bool)
+            for dimension, code in profile.items():
+                mask &= self.cells[dimension] == code
+            counts = int(self.count[mask].sum()), int(self.severe[mask].sum())
+            with self._memo_lock:
+                if len(self._memo) > 4096:
+                    self._memo.clear()
+                self._memo[key] = counts
+        return counts
+
+    def query(self, **profile):
+        """
+        Returns the victims matching a profile (same keywords as RiskIndex.score), their
+        share of all victims, the share expected if the selected factors were independent,
+        the lift between the two, and the severe (killed or hospitalized) injury rate.
+        """
+        codes = {}
+        for dimension, value in profile.items():
+            code = self._code(dimension, value)
+            if code is not None:
+                codes[dimension] = code
+
+        victims, severe = self._counts(codes)
+        share = victims / self.total if self.total else 0.0
+        expected = 1.0
+        for dimension, code in codes.items():
+            expected *= self._counts({dimension: code})[0] / self.total if self.total else 0.0
+        return {
+            'victims': victims,
+            'share': share,
+            'expected_share': expected,
+            'lift': share / expected if expected else float('nan'),
+            'severe_rate': severe / victims if victims else float('nan'),
+        }
@@ -0,0 +1,60 @@
+# datalib/rollups.py
+# Pre-aggregated metrics per dimension value, computed in one pass over a table.
+
+import numpy as np
+import pandas as pd
+
+from datalib.timing import timed_stage
+
+AGGREGATES = ['count', 'sum', 'mean']
+
+
+@timed_stage('aggregate')
+def build_rollups(data, dimensions, metrics, derived=None):
+    """
+    Sums and non-missing counts of every metric for every combination of the dimensions,
+    computed in one pass, then rolled up to each dimension on its own.
+
+    derived maps extra metric names to a function of the table (e.g. {'has_tip': lambda
+    data: data['tip_amount'] > 0}), so that no column has to be added to the table.
+
+    Returns {dimension: DataFrame} indexed by the dimension values, with (metric, aggregate)
+    columns for every aggregate of AGGREGATES, plus ('trips', 'count').
+    """
+    derived = derived or {}
+
+    # One cell per distinct combination of the dimension values
+    codes, uniques = {}, {}
+    keys = np.zeros(len(data), dtype='int64')
+    for dimension in dimensions:
+        codes[dimension], uniques[dimension] = pd.factorize(data[dimension], sort=True, use_na_sentinel=False)
+        keys = keys * len(uniques[dimension]) + codes[dimension]
+    cells, inverse = np.unique(keys, return_inverse=True)
+
+    totals = {('trips', 'count'): np.bincount(inverse, minlength=len(cells))}
+    for metric in metrics:
+        values = derived[metric](data) if metric in derived else data[metric]
+        values = np.asarray(values, dtype='float64')
+        known = ~np.isnan(values)
+        totals[(metric, 'sum')] = np.bincount(inverse[known], weights=values[known], minlength=len(cells))
+        totals[(metric, 'count')] = np.bincount(inverse[known], minlength=len(cells))
+    cell_totals = pd.DataFrame(totals)
+
+    # Dimension codes of each cell, from its mixed-radix key
+    cell_codes = {}
+    for dimension in reversed(dimensions):
+        cells, cell_codes[dimension] = np.divmod(cells, len(uniques[dimension]))
+
+    rollups = {}
+    for dimension in dimensions:
+        totals = cell_totals.groupby(cell_codes[dimension]).sum()
+        totals.index = pd.Index(np.asarray(uniques[dimension])[totals.index], name=dimension)
+        for metric in metrics:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                totals[(metric, 'mean')] = totals[(metric, 'sum')] / totals[(metric, 'count')]
+        rollups[dimension] = totals.sort_index(axis=1)
+    return rollups
+
+def rollup(rollups, dimension, metric, aggregate='mean'):
+    """One aggregate of a metric per dimension value, as a two-column frame (dimension, metric)."""
+    return rollups[dimension][(metric, aggregate)].rename(metric).reset_index()
@@ -0,0 +1,67 @@
+# datalib/sampling.py
+# Seeded samples for the plot layer: the same rows on every rerun, for the same data.
+
+import numpy as np
+import pandas as pd
+
+from datalib.timing import timed_stage
+
+
+def stratified_positions(strata, n, seed=0, min_per_stratum=1):
+    """
+    Positions of about n rows, drawn from each stratum (array of stratum keys, one per row)
+    in proportion to its size, with at least min_per_stratum rows per stratum so that rare
+    strata stay represented. The same seed always gives the same positions.
+    """
+    strata = np.asarray(strata)
+    if len(strata) <= n:
+        return np.arange(len(strata))
+    _, strata, sizes = np.unique(strata, return_inverse=True, return_counts=True)
+    quotas = np.minimum(sizes, np.maximum(min_per_stratum, np.round(sizes * n / len(strata)))).astype('int64')
+
+    # Rank of each row within its stratum, in a seeded random order
+    order = np.lexsort((np.random.default_rng(seed).random(len(strata)), strata))
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    ranks = np.empty(len(strata), dtype='int64')
+    ranks[order] = np.arange(len(strata)) - starts[strata[order]]
+    return np.flatnonzero(ranks < quotas[strata])
+
+@timed_stage('aggregate')
+def stratified_sample(data, by, n, seed=0, min_per_stratum=1):
+    """
+    Seeded sample of about n rows of data, stratified on the columns in by
+    (e.g. ['Severity', 'lum', 'hour']), in the original row order.
+    Missing values form their own stratum.
+    """
+    if not by:
+        return uniform_sample(data, n, seed)
+    strata = data.groupby(list(by), observed=True, dropna=False, sort=False).ngroup().to_numpy()
+    return data.iloc[stratified_positions(strata, n, seed, min_per_stratum)]
+
+def uniform_sample(data, n, seed=0):
+    if len(data) <= n:
+        return data
+    positions = np.random.default_rng(seed).choice(len(data), size=n, replace=False)
+    return data.iloc[np.sort(positions)]
+
+def reservoir_sample(chunks, n, seed=0):
+    """
+    Uniform sample of n rows from an iterable of DataFrames (e.g. pd.read_csv(..., chunksize=...)),
+    reading each chunk once and keeping at most n rows in memory besides the current chunk.
+
+    Every row gets a seeded random key and the n smallest keys are kept, which is a
+    uniform sample without replacement; the result depends only on the seed and the rows.
+    """
+    rng = np.random.default_rng(seed)
+    sample, keys = None, np.empty(0)
+    for chunk in chunks:
+        chunk_keys = rng.random(len(chunk))
+        if sample is None:
+            sample, keys = chunk.reset_index(drop=True), chunk_keys
+        else:
+            sample = pd.concat([sample, chunk], ignore_index=True)
+            keys = np.concatenate([keys, chunk_keys])
+        if len(sample) > n:
+            kept = np.sort(np.argpartition(keys, n - 1)[:n])
+            sample, keys = sample.iloc[kept].reset_index(drop=True), keys[kept]
+    return sample if sample is not None else pd.DataFrame()
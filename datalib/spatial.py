@@ -0,0 +1,89 @@
+# datalib/spatial.py
+# Grid index over point coordinates, for viewport and radius queries on the accident maps.
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+# Bounding box of metropolitan France (lat_min, lat_max, lon_min, lon_max)
+FRANCE_BBOX = (41, 51, -5, 10)
+
+
+def haversine_km(lat, lon, center_lat, center_lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    center_lat, center_lon = np.radians(center_lat), np.radians(center_lon)
+    a = np.sin((lat - center_lat) / 2) ** 2 + np.cos(lat) * np.cos(center_lat) * np.sin((lon - center_lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class SpatialIndex:
+    """
+    Points bucketed on a regular lat/long grid and sorted by cell, built once.
+
+    A bounding-box query only reads the points of the cells it overlaps (one contiguous
+    slice per grid row), so its cost depends on the viewport, not on the table size.
+    Queries return row positions in the original arrays.
+
+    Every point also gets a fixed random priority, used by thin(): keeping the points of
+    lowest priority is a uniform, hence density-preserving, sample that is the same on
+    every rerun and only grows when the viewport shrinks.
+    """
+
+    def __init__(self, lat, lon, cell_size=0.05, seed=0):
+        lat = np.asarray(lat, dtype='float64')
+        lon = np.asarray(lon, dtype='float64')
+        valid = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180))
+
+        self.cell_size = cell_size
+        self.columns = int(np.ceil(360 / cell_size)) + 1
+        keys = self._row(lat[valid]) * self.columns + self._column(lon[valid])
+        order = np.argsort(keys, kind='stable')
+
+        self.keys = keys[order]
+        self.positions = valid[order]
+        self.lat = lat[self.positions]
+        self.lon = lon[self.positions]
+        self.priority = np.random.default_rng(seed).permutation(len(lat))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _row(self, lat):
+        return np.floor((np.asarray(lat) + 90) / self.cell_size).astype('int64')
+
+    def _column(self, lon):
+        return np.floor((np.asarray(lon) + 180) / self.cell_size).astype('int64')
+
+    def _candidates(self, lat_min, lat_max, lon_min, lon_max):
+        # Indices (in sorted order) of the points of every cell overlapping the box
+        column_min = int(self._column(max(lon_min, -180)))
+        column_max = int(self._column(min(lon_max, 180)))
+        rows = np.arange(self._row(max(lat_min, -90)), self._row(min(lat_max, 90)) + 1)
+        if not len(rows) or column_min > column_max:
+            return np.empty(0, dtype='int64')
+        starts = np.searchsorted(self.keys, rows * self.columns + column_min, side='left')
+        ends = np.searchsorted(self.keys, rows * self.columns + column_max, side='right')
+        return np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+
+    def bbox(self, lat_min, lat_max, lon_min, lon_max):
+        """Row positions of the points inside the box, bounds included."""
+        candidates = self._candidates(lat_min, lat_max, lon_min, lon_max)
+        lat, lon = self.lat[candidates], self.lon[candidates]
+        inside = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+        return np.sort(self.positions[candidates[inside]])
+
+    def radius(self, lat, lon, km):
+        """Row positions of the points within km kilometers of (lat, lon)."""
+        lat_delta = np.degrees(km / EARTH_RADIUS_KM)
+        lon_delta = lat_delta / max(np.cos(np.radians(lat)), 1e-6)
+        candidates = self._candidates(lat - lat_delta, lat + lat_delta, lon - lon_delta, lon + lon_delta)
+        inside = haversine_km(self.lat[candidates], self.lon[candidates], lat, lon) <= km
+        return np.sort(self.positions[candidates[inside]])
+
+    def thin(self, positions, max_points):
+        """The max_points positions of lowest priority (all of them if there are fewer), in order."""
+        positions = np.asarray(positions)
+        if len(positions) <= max_points:
+            return positions
+        kept = np.argpartition(self.priority[positions], max_points - 1)[:max_points]
+        return np.sort(positions[kept])
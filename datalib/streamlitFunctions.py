@@ -2,6 +2,8 @@
 
 import streamlit as st
 
+from datalib.timing import recording, timed
+
 def center_text(text):
     st.markdown(f'<p style="text-align:center;">{text}</p>', unsafe_allow_html=True)
 
@@ -41,4 +43,106 @@ def display_logo(image_path: str, link_url: str, width: int = 50, height: int =
                 <img src="{image_path}" alt="Logo" style="width:{width}px; height:{height}px;"/>
             </a>
         </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+
+def _chart_name(fig):
+    # Title of the figure, or its axes when the title is blank
+    title = (fig.layout.title.text or '').strip()
+    if title:
+        return title
+    axes = [axis.title.text for axis in (fig.layout.yaxis, fig.layout.xaxis) if axis.title.text]
+    return ' by '.join(axes) or 'plotly_chart'
+
+# st.plotly_chart, recorded as a chart stage (serialization and emission) when diagnostics are on
+def plotly_chart(fig, **kwargs):
+    if not recording():
+        return st.plotly_chart(fig, **kwargs)
+    with timed('chart', _chart_name(fig)):
+        return st.plotly_chart(fig, **kwargs)
+
+def _self_times(stages):
+    # Time of each stage minus the time of the stages nested directly in it
+    self_times = [stage['duration'] for stage in stages]
+    parents = []
+    for index, stage in enumerate(stages):
+        del parents[stage['depth']:]
+        if parents:
+            self_times[parents[-1]] -= stage['duration']
+        parents.append(index)
+    return self_times
+
+def timing_panel(stages):
+    """
+    Waterfall of the stages recorded during a rerun (see datalib.timing), nested stages
+    indented under their parent, and the time spent in each kind of stage.
+    """
+    import pandas as pd
+    import plotly.graph_objects as go
+
+    with st.expander("⏱️ Rerun timings", expanded=True):
+        stages = [stage for stage in stages if stage['duration'] is not None]
+        if not stages:
+            st.write("No stage was recorded during this rerun.")
+            return
+        timings = pd.DataFrame(stages)
+        timings['self'] = _self_times(stages)
+        timings['label'] = [f"{index + 1}. {'· ' * depth}{name}" for index, (depth, name) in enumerate(zip(timings['depth'], timings['name']))]
+
+        fig = go.Figure()
+        for stage, rows in timings.groupby('stage', sort=False):
+            fig.add_trace(go.Bar(
+                name=stage, y=rows['label'], x=rows['duration'] * 1000, base=rows['start'] * 1000, orientation='h',
+                customdata=rows[['detail']], hovertemplate='%{y}<br>%{x:.1f} ms %{customdata[0]}<extra>' + stage + '</extra>',
+            ))
+        fig.update_layout(
+            barmode='overlay', height=max(300, 22 * len(timings)), xaxis_title='ms since the start of the rerun',
+            yaxis=dict(autorange='reversed', categoryorder='array', categoryarray=timings['label']),
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        totals = timings.groupby('stage', sort=False).agg(calls=('name', 'size'), self_ms=('self', 'sum'))
+        totals['self_ms'] *= 1000
+        st.dataframe(totals.sort_values('self_ms', ascending=False).round(1), use_container_width=True)
+
+def track_memory():
+    """
+    Starts the process RSS sampler (once per process) and records what the current session
+    retains (see datalib.memory).
+    """
+    # Imported on the first rerun that gets here rather than with the app
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    from datalib.memory import record_session, start_rss_sampler
+
+    start_rss_sampler()
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        record_session(ctx.session_id, st.session_state.to_dict())
+
+def memory_panel():
+    """
+    Process RSS over time, deep size of every cached dataset and of what each session
+    retains (see datalib.memory and track_memory).
+    """
+    import plotly.express as px
+    from datalib.memory import cache_counters, dataset_sizes, rss_history, sample_rss, session_sizes
+    from datalib.figures import figure_cache_stats
+
+    sample_rss()
+
+    with st.expander("🧠 Memory", expanded=True):
+        datasets = dataset_sizes()
+        history = rss_history()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Process RSS", f"{history['rss_mb'].iloc[-1]:,.0f} MB", f"peak {history['rss_mb'].max():,.0f} MB", delta_color='off')
+        col2.metric("Cached datasets", f"{datasets['bytes'].sum() / 1e6:,.0f} MB", f"{len(datasets)} entries", delta_color='off')
+        col3.metric("Cached figures", f"{figure_cache_stats()['bytes'] / 1e6:,.1f} MB", f"{figure_cache_stats()['figures']} figures", delta_color='off')
+
+        fig = px.line(history, x='time', y='rss_mb', title='Process RSS (MB)', markers=len(history) < 50)
+        st.plotly_chart(fig, use_container_width=True)
+
+        datasets['MB'] = (datasets.pop('bytes') / 1e6).round(2)
+        st.dataframe(datasets, use_container_width=True, hide_index=True)
+        st.dataframe(cache_counters(), use_container_width=True)
+        sessions = session_sizes()
+        sessions['MB'] = (sessions.pop('bytes') / 1e6).round(3)
+        st.dataframe(sessions, use_container_width=True)
@@ -0,0 +1,325 @@
+# datalib/synthetic.py
+# Synthetic Uber trips and accidents tables with the schemas of the real data, at any size.
+# python -m datalib.synthetic {uber,accidents,all} [--out DIR] [--rows N] [--seed S] [--chunk-size N]
+
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import DATA_DIR, DATA_ENV, DEFAULT_DATA_DIR
+from datalib.accidents import CARACTERISTIQUES_PATH, USAGERS_PATH
+from datalib.etl import ROW_GROUP_SIZE
+from datalib.uber import RAW_PATH
+
+# Written under a root of their own, in the layout of the data directory, never over the real
+# data: the app and the benchmarks read them with PORTFOLIO_DATA=data/synthetic (see config.DATA_DIR)
+SYNTHETIC_DIR = 'data/synthetic'
+
+# Rows generated and written at a time: memory depends on it, not on the number of rows
+CHUNK_SIZE = 500_000
+
+# Uber trips: New York yellow cabs, first quarter of 2015
+TRIPS_START = pd.Timestamp('2015-01-01')
+TRIPS_DAYS = 90
+TRIP_HOURS = [3.6, 2.7, 2.0, 1.5, 1.1, 1.0, 2.1, 3.7, 4.5, 4.5, 4.3, 4.4, 4.7, 4.7, 4.9, 4.9, 4.6, 5.3, 6.2, 6.1, 5.6, 5.5, 5.3, 4.6]
+TRIP_SPEED_MPH = [17, 18, 19, 20, 21, 19, 15, 12, 10, 10, 10, 10, 10, 10, 10, 10, 11, 11, 11, 12, 13, 14, 15, 16]
+PASSENGER_COUNTS = {0: 0.001, 1: 0.70, 2: 0.14, 3: 0.04, 4: 0.02, 5: 0.06, 6: 0.039}
+# Pickup areas: (lat, lon, spread in degrees, share of the trips)
+PICKUP_AREAS = [
+    (40.755, -73.980, 0.020, 0.85),  # Manhattan
+    (40.690, -73.960, 0.030, 0.07),  # Brooklyn
+    (40.645, -73.780, 0.005, 0.04),  # JFK
+    (40.774, -73.872, 0.004, 0.04),  # LaGuardia
+]
+
+# Accidents: years of the data.gouv.fr files, with their relative number of accidents
+ACCIDENT_YEARS = {year: weight for year, weight in zip(range(2005, 2023), np.linspace(1.6, 1.0, 18))}
+ACCIDENT_YEARS[2020] *= 0.85
+# Department -> (lat, lon of its prefecture, population in millions); 97 gathers the overseas departments
+DEPARTMENTS = {
+    '01': (46.21, 5.23, 0.66), '02': (49.56, 3.62, 0.53), '03': (46.57, 3.33, 0.34), '04': (44.09, 6.24, 0.17),
+    '05': (44.56, 6.08, 0.14), '06': (43.70, 7.27, 1.09), '07': (44.74, 4.60, 0.33), '08': (49.77, 4.72, 0.27),
+    '09': (42.97, 1.61, 0.15), '10': (48.30, 4.08, 0.31), '11': (43.21, 2.35, 0.37), '12': (44.35, 2.57, 0.28),
+    '13': (43.30, 5.37, 2.04), '14': (49.18, -0.37, 0.70), '15': (44.93, 2.44, 0.14), '16': (45.65, 0.16, 0.35),
+    '17': (46.16, -1.15, 0.65), '18': (47.08, 2.40, 0.30), '19': (45.27, 1.77, 0.24), '21': (47.32, 5.04, 0.53),
+    '22': (48.51, -2.76, 0.60), '23': (46.17, 1.87, 0.12), '24': (45.18, 0.72, 0.41), '25': (47.24, 6.02, 0.54),
+    '26': (44.93, 4.89, 0.52), '27': (49.02, 1.15, 0.60), '28': (48.45, 1.49, 0.43), '29': (48.00, -4.10, 0.91),
+    '2A': (41.93, 8.74, 0.16), '2B': (42.70, 9.45, 0.18), '30': (43.84, 4.36, 0.75), '31': (43.60, 1.44, 1.40),
+    '32': (43.65, 0.59, 0.19), '33': (44.84, -0.58, 1.62), '34': (43.61, 3.88, 1.18), '35': (48.11, -1.68, 1.08),
+    '36': (46.81, 1.69, 0.22), '37': (47.39, 0.69, 0.61), '38': (45.19, 5.72, 1.27), '39': (46.67, 5.55, 0.26),
+    '40': (43.89, -0.50, 0.41), '41': (47.59, 1.33, 0.33), '42': (45.44, 4.39, 0.76), '43': (45.04, 3.88, 0.23),
+    '44': (47.22, -1.55, 1.43), '45': (47.90, 1.90, 0.68), '46': (44.45, 1.44, 0.17), '47': (44.20, 0.62, 0.33),
+    '48': (44.52, 3.50, 0.08), '49': (47.47, -0.55, 0.82), '50': (49.12, -1.09, 0.50), '51': (48.96, 4.36, 0.57),
+    '52': (48.11, 5.14, 0.17), '53': (48.07, -0.77, 0.31), '54': (48.69, 6.18, 0.73), '55': (48.77, 5.16, 0.18),
+    '56': (47.66, -2.76, 0.76), '57': (49.12, 6.18, 1.04), '58': (46.99, 3.16, 0.20), '59': (50.63, 3.06, 2.61),
+    '60': (49.43, 2.08, 0.83), '61': (48.43, 0.09, 0.28), '62': (50.29, 2.78, 1.46), '63': (45.78, 3.08, 0.66),
+    '64': (43.30, -0.37, 0.68), '65': (43.23, 0.08, 0.23), '66': (42.70, 2.90, 0.48), '67': (48.57, 7.75, 1.14),
+    '68': (48.08, 7.36, 0.77), '69': (45.76, 4.84, 1.88), '70': (47.62, 6.15, 0.23), '71': (46.31, 4.83, 0.55),
+    '72': (48.00, 0.20, 0.57), '73': (45.57, 5.92, 0.44), '74': (45.90, 6.13, 0.83), '75': (48.86, 2.35, 2.15),
+    '76': (49.44, 1.10, 1.25), '77': (48.54, 2.66, 1.42), '78': (48.80, 2.13, 1.45), '79': (46.32, -0.46, 0.37),
+    '80': (49.89, 2.30, 0.57), '81': (43.93, 2.15, 0.39), '82': (44.02, 1.35, 0.26), '83': (43.12, 5.93, 1.08),
+    '84': (43.95, 4.81, 0.56), '85': (46.67, -1.43, 0.69), '86': (46.58, 0.34, 0.44), '87': (45.83, 1.26, 0.37),
+    '88': (48.17, 6.45, 0.36), '89': (47.80, 3.57, 0.33), '90': (47.64, 6.86, 0.14), '91': (48.63, 2.44, 1.30),
+    '92': (48.89, 2.21, 1.62), '93': (48.91, 2.44, 1.66), '94': (48.79, 2.46, 1.41), '95': (49.04, 2.08, 1.25),
+    '97': (-21.12, 55.53, 2.20),
+}
+# Paris has about twice as many accidents as its population suggests, on a much smaller area
+DEPARTMENT_RATE = {'75': 2.0}
+DEPARTMENT_SPREAD = {'75': 0.03, '92': 0.05, '93': 0.05, '94': 0.05}
+DEFAULT_SPREAD = 0.25
+
+# Shares of the codes documented in columns.txt
+ACCIDENT_HOURS = [1.5, 1.2, 1.0, 0.9, 0.8, 1.0, 2.0, 4.5, 6.0, 4.5, 4.3, 5.0, 5.5, 5.3, 5.2, 5.8, 6.8, 8.0, 8.2, 6.5, 4.5, 3.3, 2.7, 2.0]
+ACCIDENT_MONTHS = [7.6, 7.2, 8.1, 8.0, 8.7, 9.3, 9.0, 7.6, 8.8, 9.0, 8.5, 8.2]
+DAYS_IN_MONTH = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+# Lighting (lum 1-5) by time of day
+LIGHTING = {
+    'day': [0.85, 0.06, 0.03, 0.01, 0.05],
+    'twilight': [0.35, 0.40, 0.05, 0.02, 0.18],
+    'night': [0.05, 0.10, 0.30, 0.05, 0.50],
+}
+AREAS = {1: 0.32, 2: 0.68}
+INTERSECTIONS = {1: 0.60, 2: 0.10, 3: 0.17, 4: 0.03, 5: 0.01, 6: 0.05, 7: 0.01, 8: 0.003, 9: 0.027}
+WEATHER = {1: 0.80, 2: 0.10, 3: 0.025, 4: 0.007, 5: 0.006, 6: 0.006, 7: 0.013, 8: 0.04, 9: 0.003}
+COLLISIONS = {1: 0.08, 2: 0.17, 3: 0.30, 4: 0.05, 5: 0.06, 6: 0.25, 7: 0.09}
+# Users per accident
+USERS_PER_ACCIDENT = {1: 0.30, 2: 0.45, 3: 0.15, 4: 0.06, 5: 0.03, 6: 0.01}
+# Users after the first one (a driver): catu 1 driver, 2 passenger, 3 pedestrian
+OTHER_USERS = {1: 0.55, 2: 0.35, 3: 0.10}
+PASSENGER_PLACES = {2: 0.45, 3: 0.15, 4: 0.05, 5: 0.20, 6: 0.03, 7: 0.03, 8: 0.05, 9: 0.04}
+# Severity (grav 1-4) and share of men by category of user
+SEVERITY = {
+    1: [0.45, 0.025, 0.15, 0.375],
+    2: [0.40, 0.020, 0.16, 0.420],
+    3: [0.05, 0.050, 0.35, 0.550],
+}
+MALE_SHARE = {1: 0.72, 2: 0.45, 3: 0.55}
+TRIP_PURPOSES = {1: 0.15, 2: 0.03, 3: 0.05, 4: 0.05, 5: 0.45, 6: 0.17, 7: 0.10}
+# Share of missing values in the nullable columns
+MISSING_SHARE = 0.01
+
+
+def _choice(rng, shares, size):
+    # Codes drawn with the given {code: share}, shares normalized
+    codes = np.array(list(shares))
+    p = np.array(list(shares.values()), dtype='float64')
+    return codes[rng.choice(len(codes), size=size, p=p / p.sum())]
+
+def _nullable(rng, values, dtype, missing_share=MISSING_SHARE):
+    values = pd.array(values, dtype=dtype)
+    values[rng.random(len(values)) < missing_share] = pd.NA
+    return values
+
+def holds_app_data(root):
+    """Whether root is the real data directory or the one the app reads (PORTFOLIO_DATA), links resolved."""
+    return os.path.realpath(root) in {os.path.realpath(DEFAULT_DATA_DIR), os.path.realpath(DATA_DIR)}
+
+def synthetic_path(root, path):
+    """Where a dataset path of the data directory (e.g. datalib.uber.RAW_PATH) lies under root."""
+    if holds_app_data(root):
+        raise ValueError(f"{root} holds the data the app reads, write the synthetic tables elsewhere (e.g. {SYNTHETIC_DIR})")
+    return os.path.join(root, os.path.relpath(path, DATA_DIR))
+
+def _chunks(rows, chunk_size):
+    for start in range(0, rows, chunk_size):
+        yield start, min(start + chunk_size, rows)
+
+
+def trips_chunk(rng, rows):
+    """rows raw Uber trips, with the columns of uberdata.csv, invalid rows included."""
+    hours = rng.choice(24, size=rows, p=np.array(TRIP_HOURS) / sum(TRIP_HOURS))
+    pickup_seconds = rng.integers(0, TRIPS_DAYS, rows) * 86400 + hours * 3600 + rng.integers(0, 3600, rows)
+    distance = np.clip(rng.lognormal(0.5, 0.8, rows), 0.01, 60)
+    speed = np.array(TRIP_SPEED_MPH)[hours] * rng.lognormal(0, 0.3, rows)
+    duration_s = (distance / speed * 3600 + rng.exponential(60, rows)).astype('int64')
+
+    area = rng.choice(len(PICKUP_AREAS), size=rows, p=[share for *_, share in PICKUP_AREAS])
+    centers = np.array([(lat, lon, spread) for lat, lon, spread, _ in PICKUP_AREAS])[area]
+    pickup_lat = centers[:, 0] + rng.normal(0, 1, rows) * centers[:, 2]
+    pickup_lon = centers[:, 1] + rng.normal(0, 1, rows) * centers[:, 2]
+    # Straight line of about 3/4 of the driven distance, in a random direction (miles -> degrees)
+    heading = rng.uniform(0, 2 * np.pi, rows)
+    dropoff_lat = pickup_lat + 0.75 * distance * np.cos(heading) / 69.0
+    dropoff_lon = pickup_lon + 0.75 * distance * np.sin(heading) / 52.4
+    # Some trips are recorded without coordinates
+    unlocated = rng.random(rows) < 0.015
+    pickup_lat[unlocated] = pickup_lon[unlocated] = dropoff_lat[unlocated] = dropoff_lon[unlocated] = 0
+
+    # Metered fare ($2.50 + $2.50 a mile + waiting time), rounded to 50 cents, card tips on 60% of the trips
+    fare = np.round((2.5 + 2.5 * distance + 0.2 * duration_s / 60) * 2) / 2
+    tipped = rng.random(rows) < 0.6
+    tip = np.where(tipped, np.round(fare * rng.choice([0.15, 0.2, 0.25, 0.3], size=rows, p=[0.2, 0.5, 0.2, 0.1]), 2), 0)
+    extra = np.select([(hours >= 16) & (hours < 20), (hours >= 20) | (hours < 6)], [1.0, 0.5], 0)
+    total = np.round(fare + tip + extra + 0.5 + 0.3, 2)
+
+    # Invalid records, as removed by datalib.uber.clean_trips
+    distance[rng.random(rows) < 0.005] = 0
+    fare[rng.random(rows) < 0.0005] *= -1
+
+    pickup = TRIPS_START + pd.to_timedelta(pickup_seconds, unit='s')
+    return pd.DataFrame({
+        'VendorID': rng.choice([1, 2], size=rows, p=[0.47, 0.53]),
+        'tpep_pickup_datetime': pickup,
+        'tpep_dropoff_datetime': pickup + pd.to_timedelta(duration_s, unit='s'),
+        'passenger_count': _choice(rng, PASSENGER_COUNTS, rows),
+        'trip_distance': np.round(distance, 2),
+        'pickup_longitude': np.round(pickup_lon, 6),
+        'pickup_latitude': np.round(pickup_lat, 6),
+        'dropoff_longitude': np.round(dropoff_lon, 6),
+        'dropoff_latitude': np.round(dropoff_lat, 6),
+        'fare_amount': fare,
+        'tip_amount': tip,
+        'total_amount': total,
+    })
+
+def write_trips(root, rows=1_000_000, seed=0, chunk_size=CHUNK_SIZE):
+    """
+    Writes rows synthetic trips as a raw uberdata.csv under root, one chunk at a time. The
+    same seed and chunk size always give the same file.
+    """
+    path = synthetic_path(root, RAW_PATH)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w', newline='') as f:
+        for index, (start, end) in enumerate(_chunks(rows, chunk_size)):
+            rng = np.random.default_rng([seed, index])
+            trips_chunk(rng, end - start).to_csv(f, index=False, header=index == 0)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def accidents_chunk(rng, year, first_id, departments):
+    """
+    Cleaned characteristics of the accidents first_id, first_id + 1, ... in the given
+    departments (one per accident), and their users, in the compact schemas.
+    """
+    rows = len(departments)
+    num_acc = year * 100_000_000 + first_id + np.arange(rows, dtype='int64')
+    hours = rng.choice(24, size=rows, p=np.array(ACCIDENT_HOURS) / sum(ACCIDENT_HOURS))
+    months = rng.choice(12, size=rows, p=np.array(ACCIDENT_MONTHS) / sum(ACCIDENT_MONTHS)) + 1
+    days = (rng.random(rows) * np.array(DAYS_IN_MONTH)[months - 1]).astype('int64') + 1
+
+    period = np.select([(hours >= 8) & (hours < 19), np.isin(hours, [6, 7, 19, 20])], ['day', 'twilight'], 'night')
+    lighting = np.empty(rows, dtype='int64')
+    for name, shares in LIGHTING.items():
+        mask = period == name
+        lighting[mask] = _choice(rng, dict(zip(range(1, 6), shares)), mask.sum())
+
+    codes = np.array(sorted(DEPARTMENTS))
+    centers = np.array([DEPARTMENTS[code][:2] for code in codes])[np.searchsorted(codes, departments)]
+    spread = np.array([DEPARTMENT_SPREAD.get(code, DEFAULT_SPREAD) for code in departments])
+
+    caracteristiques = pd.DataFrame({
+        'num_acc': num_acc,
+        'mois': months.astype('int8'),
+        'jour': days.astype('int8'),
+        'hour': pd.array(hours, dtype='Int8'),
+        'minute': pd.array(rng.integers(0, 60, rows), dtype='Int8'),
+        'lum': pd.array(lighting, dtype='Int8'),
+        'agg': pd.array(_choice(rng, AREAS, rows), dtype='Int8'),
+        'int': pd.array(_choice(rng, INTERSECTIONS, rows), dtype='Int8'),
+        'atm': _nullable(rng, _choice(rng, WEATHER, rows), 'Int8'),
+        'col': _nullable(rng, _choice(rng, COLLISIONS, rows), 'Int8'),
+        'lat': centers[:, 0] + rng.normal(0, 1, rows) * spread,
+        'long': centers[:, 1] + rng.normal(0, 1, rows) * spread,
+        'dep': departments,
+    })
+
+    # Users, in accident order: a driver first, then other drivers, passengers and pedestrians
+    counts = _choice(rng, USERS_PER_ACCIDENT, rows)
+    users = counts.sum()
+    first = np.zeros(users, dtype=bool)
+    first[np.concatenate([[0], np.cumsum(counts)[:-1]])] = True
+    categories = np.where(first, 1, _choice(rng, OTHER_USERS, users))
+    places = np.where(categories == 1, 1, _choice(rng, PASSENGER_PLACES, users))
+    severity = np.empty(users, dtype='int64')
+    for category, shares in SEVERITY.items():
+        mask = categories == category
+        severity[mask] = _choice(rng, dict(zip(range(1, 5), shares)), mask.sum())
+    male = rng.random(users) < np.array([0] + [MALE_SHARE[category] for category in sorted(MALE_SHARE)])[categories]
+    ages = np.clip(np.round(rng.lognormal(3.55, 0.45, users)), 0, 99).astype('int64')
+    ages = np.where(categories == 1, np.maximum(ages, 14), ages)
+
+    places = pd.array(places, dtype='Int8')
+    places[categories == 3] = pd.NA
+    usagers = pd.DataFrame({
+        'num_acc': np.repeat(num_acc, counts),
+        'place': places,
+        'catu': pd.array(categories, dtype='Int8'),
+        'grav': pd.array(severity, dtype='Int8'),
+        'sexe': pd.array(np.where(male, 1, 2), dtype='Int8'),
+        'trajet': _nullable(rng, _choice(rng, TRIP_PURPOSES, users), 'Int8'),
+        'an_nais': _nullable(rng, year - ages, 'Int16'),
+    })
+    return caracteristiques, usagers
+
+def _department_counts(rng, accidents):
+    # Accidents of a year per department, in department order
+    codes = sorted(DEPARTMENTS)
+    weights = np.array([DEPARTMENTS[code][2] * DEPARTMENT_RATE.get(code, 1) for code in codes])
+    return np.array(codes), rng.multinomial(accidents, weights / weights.sum())
+
+def _partition_writer(root, year, schema):
+    directory = os.path.join(root, f'annee={year}')
+    os.makedirs(directory, exist_ok=True)
+    # Named as in datalib.etl.write_partition, so that readers skip it until it is complete
+    temporary = os.path.join(directory, '_part-0.parquet.tmp')
+    return temporary, os.path.join(directory, 'part-0.parquet'), pq.ParquetWriter(temporary, schema)
+
+def write_accidents_year(root, year, accidents, seed=0, chunk_size=CHUNK_SIZE):
+    """
+    Writes the characteristics and users partitions of a year under root, one chunk at a
+    time, in the layout written by datalib.etl: accidents are generated department by
+    department, so that both files come out sorted as in datalib.etl.PARTITION_SORT.
+    """
+    caracteristiques_root, usagers_root = synthetic_path(root, CARACTERISTIQUES_PATH), synthetic_path(root, USAGERS_PATH)
+    codes, counts = _department_counts(np.random.default_rng([seed, year]), accidents)
+    boundaries = np.cumsum(counts)
+    writers = {}
+    for index, (start, end) in enumerate(_chunks(accidents, chunk_size)):
+        rng = np.random.default_rng([seed, year, index])
+        departments = codes[np.searchsorted(boundaries, np.arange(start, end), side='right')]
+        for table_root, data in zip((caracteristiques_root, usagers_root), accidents_chunk(rng, year, start + 1, departments)):
+            # Plain strings for the department, as in datalib.etl.write_partition
+            table = pa.Table.from_pandas(data.astype({column: object for column in data.select_dtypes('category').columns}), preserve_index=False)
+            if table_root not in writers:
+                writers[table_root] = _partition_writer(table_root, year, table.schema)
+            writers[table_root][2].write_table(table, row_group_size=ROW_GROUP_SIZE)
+    for temporary, path, writer in writers.values():
+        writer.close()
+        os.replace(temporary, path)
+    return year
+
+def write_accidents(root, accidents=1_000_000, seed=0, chunk_size=CHUNK_SIZE, years=None):
+    """
+    Writes about accidents synthetic accidents (and about twice as many users) spread over
+    the years as in the real data, as cleaned partitions under root. Returns the years.
+    """
+    years = {year: ACCIDENT_YEARS[year] for year in (years or ACCIDENT_YEARS)}
+    total = sum(years.values())
+    for year, weight in years.items():
+        write_accidents_year(root, year, int(round(accidents * weight / total)), seed, chunk_size)
+    return list(years)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write synthetic Uber trips and accidents tables.')
+    parser.add_argument('dataset', choices=['uber', 'accidents', 'all'])
+    parser.add_argument('--out', default=SYNTHETIC_DIR, help=f'Root of the synthetic data directory (default: {SYNTHETIC_DIR})')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Trips, or accidents (users are about twice as many)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows generated and written at a time')
+    parser.add_argument('--years', type=int, nargs='*', help='Only write these years of accidents')
+    args = parser.parse_args()
+    if holds_app_data(args.out):
+        parser.error(f'--out {args.out} holds the data the app reads, use another directory (e.g. {SYNTHETIC_DIR})')
+
+    if args.dataset in ('uber', 'all'):
+        print(f"Writing {args.rows} trips to {write_trips(args.out, args.rows, args.seed, args.chunk_size)}")
+    if args.dataset in ('accidents', 'all'):
+        years = write_accidents(args.out, args.rows, args.seed, args.chunk_size, args.years)
+        print(f"Wrote {args.rows} accidents over {len(years)} year(s) to {synthetic_path(args.out, CARACTERISTIQUES_PATH)} and {synthetic_path(args.out, USAGERS_PATH)}")
+    print(f"Read them with {DATA_ENV}={args.out}")
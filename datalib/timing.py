@@ -0,0 +1,80 @@
+# datalib/timing.py
+# Per-rerun stage timings (reads, aggregations, figures, charts) for the diagnostics panel.
+
+import os
+import time
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+# Diagnostics are shown when this environment variable is set (e.g. PORTFOLIO_DIAGNOSTICS=1),
+# or for one session with the ?diagnostics=1 query parameter
+DIAGNOSTICS_ENV = 'PORTFOLIO_DIAGNOSTICS'
+DIAGNOSTICS_PARAM = 'diagnostics'
+
+# Records of the rerun running in this thread (every Streamlit session reruns in its own
+# thread), None when diagnostics are off: the instrumentation then only checks this
+_rerun = contextvars.ContextVar('rerun_timings', default=None)
+
+
+def diagnostics_requested(query_params):
+    def enabled(value):
+        return value not in (None, '', '0', 'false')
+    return enabled(os.environ.get(DIAGNOSTICS_ENV)) or enabled(query_params.get(DIAGNOSTICS_PARAM))
+
+def start_rerun(enabled):
+    """Starts recording the stages of a new rerun if enabled; returns its records, or None."""
+    rerun = {'start': time.perf_counter(), 'stages': [], 'open': []} if enabled else None
+    _rerun.set(rerun)
+    return rerun
+
+def recording():
+    return _rerun.get() is not None
+
+def stop_rerun():
+    """Stops recording and returns the stages of the rerun, in the order they started."""
+    rerun = _rerun.get()
+    _rerun.set(None)
+    return rerun['stages'] if rerun is not None else []
+
+@contextmanager
+def timed(stage, name):
+    """
+    Records the time spent in the block as a stage of the current rerun, e.g.
+    with timed('section', 'Conclusion'). Blocks can be nested; does nothing when no rerun
+    is being recorded.
+    """
+    rerun = _rerun.get()
+    if rerun is None:
+        yield
+        return
+    record = {'stage': stage, 'name': name, 'detail': '', 'depth': len(rerun['open']),
+              'start': time.perf_counter() - rerun['start'], 'duration': None}
+    rerun['stages'].append(record)
+    rerun['open'].append(record)
+    try:
+        yield
+    finally:
+        record['duration'] = time.perf_counter() - rerun['start'] - record['start']
+        rerun['open'].pop()
+
+def timed_stage(stage, name=None):
+    """Decorator recording every call of a function as a stage (named after the function by default)."""
+    def decorator(function):
+        label = name or function.__name__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _rerun.get() is None:
+                return function(*args, **kwargs)
+            with timed(stage, label):
+                return function(*args, **kwargs)
+
+        return wrapper
+    return decorator
+
+def note(detail):
+    """Adds a detail (e.g. 'cache hit') to the innermost stage being recorded."""
+    rerun = _rerun.get()
+    if rerun is not None and rerun['open']:
+        rerun['open'][-1]['detail'] = detail
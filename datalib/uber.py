@@ -0,0 +1,141 @@
+# datalib/uber.py
+# Offline build of the cleaned Uber trips snapshot.
+# python -m datalib.uber [--force]
+
+import os
+import argparse
+import tempfile
+import threading
+
+import pandas as pd
+import pyarrow as pa
+
+from config import DATA_DIR
+from datalib.timing import timed_stage
+
+RAW_PATH = os.path.join(DATA_DIR, 'uberdata', 'uberdata.csv')
+SNAPSHOT_PATH = os.path.join(DATA_DIR, 'uberdata', 'uberdata_cleaned.arrow')
+
+# Bump whenever the cleaning rules or the stored columns change
+SNAPSHOT_SCHEMA_VERSION = 1
+
+# Sessions loading different projections at once must not all rebuild a stale snapshot
+_rebuild_lock = threading.Lock()
+
+# Integer columns are narrowed once the invalid rows are gone
+INTEGER_TYPES = {
+    'VendorID': 'int8',
+    'passenger_count': 'int8',
+    'hour': 'int8',
+}
+
+
+def clean_trips(data):
+    date_columns = ['tpep_pickup_datetime', 'tpep_dropoff_datetime']
+    for column in date_columns:
+        data[column] = pd.to_datetime(data[column])
+    data['hour'] = data['tpep_pickup_datetime'].dt.hour
+
+    # Calculate the duration of each trip in minutes
+    data['duration'] = (data['tpep_dropoff_datetime'] - data['tpep_pickup_datetime']).dt.total_seconds() / 60
+
+    # Remove all trips with a duration of less then 1 minute
+    data = data[data['duration'] >= 1]
+
+    # Remove all trips with passenger count of 0
+    data = data[data['passenger_count'] > 0]
+
+    # Remove all trips with a fare amount <= 0
+    data = data[data['fare_amount'] > 0]
+
+    # Remove all trips with distance <= 0
+    data = data[data['trip_distance'] > 0]
+
+    # Remove all trips with duration > 244 minutes
+    data = data[data['duration'] <= 244]
+
+    # Remove lines with a duration smaller than 13 and a total amount higher that 90
+    data = data[~((data['duration'] < 13) & (data['total_amount'] > 90))]
+
+    # Remove trip distances == 99.9
+    data = data[data['trip_distance'] != 99.9]
+
+    types = {column: dtype for column, dtype in INTEGER_TYPES.items() if column in data.columns}
+    return data.astype(types).reset_index(drop=True)
+
+def build_snapshot(csv_path=RAW_PATH, snapshot_path=SNAPSHOT_PATH):
+    """
+    Cleans the raw trips CSV and writes it as an uncompressed Arrow IPC file,
+    which can be memory-mapped at load time instead of being parsed again.
+    """
+    data = clean_trips(pd.read_csv(csv_path))
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'schema_version': str(SNAPSHOT_SCHEMA_VERSION).encode(),
+    })
+
+    # Write next to the target, under a name of its own, and swap, so readers never see a
+    # partial file and concurrent builds (e.g. the app and this module's CLI) don't collide
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(snapshot_path) or '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, snapshot_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return snapshot_path
+
+def snapshot_schema_version(snapshot_path=SNAPSHOT_PATH):
+    with pa.memory_map(snapshot_path) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    version = metadata.get(b'schema_version')
+    return int(version) if version is not None else None
+
+def snapshot_is_stale(csv_path=RAW_PATH, snapshot_path=SNAPSHOT_PATH):
+    if not os.path.exists(snapshot_path):
+        return True
+    if os.path.exists(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(snapshot_path):
+        return True
+    return snapshot_schema_version(snapshot_path) != SNAPSHOT_SCHEMA_VERSION
+
+@timed_stage('read')
+def load_snapshot(snapshot_path=SNAPSHOT_PATH, columns=None, rows=None):
+    """
+    Memory-mapped read: the columns are backed by the page cache, not parsed.
+    Only the given columns, and the first rows if given, are converted to pandas.
+    """
+    with pa.memory_map(snapshot_path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(list(columns))
+    if rows is not None:
+        table = table.slice(0, rows)
+    return table.to_pandas(split_blocks=True)
+
+def load_trips(csv_path=RAW_PATH, snapshot_path=SNAPSHOT_PATH, columns=None, rows=None):
+    # Rebuild automatically when the raw CSV is newer or the schema changed, once: sessions
+    # that waited for the lock find the snapshot up to date
+    if snapshot_is_stale(csv_path, snapshot_path):
+        with _rebuild_lock:
+            if snapshot_is_stale(csv_path, snapshot_path):
+                build_snapshot(csv_path, snapshot_path)
+    return load_snapshot(snapshot_path, columns, rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the cleaned Uber trips snapshot.')
+    parser.add_argument('--csv', default=RAW_PATH, help='Raw trips CSV')
+    parser.add_argument('--out', default=SNAPSHOT_PATH, help='Arrow IPC snapshot to write')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if the snapshot is up to date')
+    args = parser.parse_args()
+
+    if args.force or snapshot_is_stale(args.csv, args.out):
+        print(f"Building {args.out} from {args.csv}...")
+        build_snapshot(args.csv, args.out)
+        print("Snapshot built.")
+    else:
+        print(f"{args.out} is up to date.")
@@ -1,13 +1,12 @@
 # main.py
 # streamlit run --server.fileWatcherType="poll"
 
+import importlib
 import streamlit as st
 from config import PAGE_TITLE, TAB_TITLE, FAVICON_LOGO
 from streamlit_option_menu import option_menu
-from datalib.streamlitFunctions import center_h1, center_text, center_h3
-from pages.aboutme import aboutme
-from pages.uberdata import uberdata
-from pages.accidents import accidents
+from datalib.streamlitFunctions import center_h1, center_text, center_h3, timing_panel, memory_panel, track_memory
+from datalib.timing import diagnostics_requested, start_rerun, stop_rerun, timed
 import warnings
 warnings.filterwarnings("ignore")
 
@@ -31,13 +30,17 @@ st.markdown(
 )
 
 # Pages
-# Define the pages
+# Define the pages, as module and function names: a page module (and pandas, plotly, its data...)
+# is only imported the first time the page is selected
 PAGES = [
-	{"name": "About Me", "function": aboutme, "icon": "file-earmark-person"},
-	{"name": "Streamlit exploration", "function": uberdata, "icon": "graph-up"},
-	{"name": "How to avoid an accident", "function": accidents, "icon": "car-front"},
+	{"name": "About Me", "module": "pages.aboutme", "function": "aboutme", "icon": "file-earmark-person"},
+	{"name": "Streamlit exploration", "module": "pages.uberdata", "function": "uberdata", "icon": "graph-up"},
+	{"name": "How to avoid an accident", "module": "pages.accidents", "function": "accidents", "icon": "car-front"},
 ]
 
+# Stage timings of this rerun, for the diagnostics panel (?diagnostics=1 or PORTFOLIO_DIAGNOSTICS=1)
+diagnostics = start_rerun(diagnostics_requested(st.query_params)) is not None
+
 # Title
 center_h1(PAGE_TITLE)
 
@@ -54,7 +57,9 @@ selection = option_menu(
 # Get and display the selected page
 selected_page = [page for page in PAGES if page['name'] == selection]
 if len(selected_page) > 0 and selected_page[0]['function'] is not None:
-    selected_page[0]['function']()
+    with timed('page', selection):
+        page_module = importlib.import_module(selected_page[0]['module'])
+        getattr(page_module, selected_page[0]['function'])()
 
 _ = [center_text("") for _ in range(5)]
 st.markdown("""
@@ -65,3 +70,11 @@ st.markdown("""
     </div>
     """, unsafe_allow_html=True)
 
+stages = stop_rerun()
+# Process RSS and session sizes recorded on every rerun, diagnostics or not, so that the
+# Memory panel covers every session and the history before a memory spike
+track_memory()
+if diagnostics:
+    timing_panel(stages)
+    memory_panel()
+
@@ -3,7 +3,7 @@ import streamlit as st
 from data.timelinedata import timeline_data
 import pandas as pd
 import plotly.express as px
-from datalib.streamlitFunctions import center_text, center_h2, display_logo, center_h3
+from datalib.streamlitFunctions import center_text, center_h2, display_logo, center_h3, plotly_chart
 from config import GITHUB_LOGO, LINKEDIN_LOGO
 
 globalpresentation = """
@@ -101,5 +101,5 @@ def aboutme():
 
     # Get the timeline figure and display it
     fig = get_timeline()
-    st.plotly_chart(fig, use_container_width=True)
+    plotly_chart(fig, use_container_width=True)
 
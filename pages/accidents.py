@@ -1,20 +1,87 @@
 import streamlit as st
-from datalib.streamlitFunctions import center_h2, center_text, center_h1, center_h3
+from datalib.streamlitFunctions import center_h2, center_text, center_h1, center_h3, plotly_chart
 import pandas as pd
 import plotly.express as px
 import math
 from st_aggrid import AgGrid
+from datalib.datasets import cached_dataset
+from datalib.timing import timed
+from datalib.figures import cached_figure
+from datalib.risk import RiskIndex, RiskCube, RISK_COLUMNS
+from datalib.spatial import SpatialIndex, FRANCE_BBOX
+from datalib.sampling import stratified_sample
+from datalib.crosstabs import crosstab
+from datalib.accidents import CARACTERISTIQUES_PATH, USAGERS_PATH, CARACTERISTIQUES_SCHEMA, USAGERS_SCHEMA, USER_FACT_LABELS, USER_FACT_CARACTERISTIQUES_COLUMNS, build_user_facts, add_derived_columns, stored_columns, dataset_filter, partition_years, whole_years, read_partitioned, read_preview, validate_schema
 
 # Load Data Functions
-def get_accidents_caracteristiques():
-	caracteristiques = pd.read_parquet('data/accidents/caracteristiques_cleaned.parquet')
-	return caracteristiques
-
-def get_accidents_usagers():
-	usagers = pd.read_parquet('data/accidents/usagers_cleaned.parquet')
-	return usagers
+# Only the given columns (all of them when None) of the selected period ((year, month),
+# (year, month)) and departments are read. Each projection and selection is cached on its own,
+# within the budget of the entries loaded with arguments (see datalib.datasets.cached_dataset)
+@cached_dataset('accidents_caracteristiques', CARACTERISTIQUES_PATH)
+def get_accidents_caracteristiques(columns=None, period=None, departments=None):
+	# Derived columns (see DERIVED_COLUMNS) are computed here, once per load
+	stored = stored_columns('caracteristiques', columns)
+	caracteristiques = read_partitioned(CARACTERISTIQUES_PATH, stored, dataset_filter(period, departments))
+	caracteristiques = validate_schema(caracteristiques, CARACTERISTIQUES_SCHEMA, 'caracteristiques', stored)
+	return add_derived_columns(caracteristiques, 'caracteristiques', columns)
+
+@cached_dataset('accidents_usagers', CARACTERISTIQUES_PATH, USAGERS_PATH)
+def get_accidents_usagers(columns=None, period=None, departments=None):
+	# Users have no department nor month: keep the users of the selected accidents, the
+	# year partitions are still pruned on their own
+	accidents = None
+	if departments is not None or whole_years(period) != period:
+		accidents = get_accidents_caracteristiques(('num_acc',), period=period, departments=departments)['num_acc'].to_numpy()
+	usagers = read_partitioned(USAGERS_PATH, columns, dataset_filter(whole_years(period), accidents=accidents))
+	return validate_schema(usagers, USAGERS_SCHEMA, 'usagers', columns)
+
+# Global filters of the accidents page (see accidents()), passed on to every loader
+def data_filters():
+	period = st.session_state.get('accidents_period')
+	departments = st.session_state.get('accidents_departments')
+	# The whole history is no filter, so that it shares the cached tables of the introduction
+	if period is not None:
+		period = tuple(tuple(bound) for bound in period)
+		if period == whole_years(available_period()):
+			period = None
+	return {
+		'period': period,
+		'departments': tuple(sorted(departments)) if departments else None,
+	}
 
-def intro(caracteristiques, usagers):
+# First and last year of the partitioned data, as a whole-year period
+def available_period():
+	years = partition_years(CARACTERISTIQUES_PATH)
+	return ((years[0], 1), (years[-1], 12)) if years else None
+
+# First rows of a table, for the introduction
+@cached_dataset('accidents_preview', CARACTERISTIQUES_PATH, USAGERS_PATH)
+def get_accidents_preview(path):
+	return read_preview(path)
+
+# User-level fact table (one row per user, with the decoded labels), shared by the analysis sections
+@cached_dataset('accidents_user_facts', CARACTERISTIQUES_PATH, USAGERS_PATH)
+def get_accidents_user_facts(period=None, departments=None):
+	return build_user_facts(get_accidents_caracteristiques(USER_FACT_CARACTERISTIQUES_COLUMNS, period=period, departments=departments),
+							get_accidents_usagers(None, period=period, departments=departments))
+
+# Contingency table of two user fact columns, counted on their codes and kept until the data changes
+@cached_dataset('accidents_crosstabs', CARACTERISTIQUES_PATH, USAGERS_PATH)
+def get_crosstab(row, col, normalize=False, period=None, departments=None):
+	return crosstab(get_accidents_user_facts(period=period, departments=departments), row, col, normalize, labels=USER_FACT_LABELS)
+
+# Seeded sample of the user facts, stratified on the given columns, kept until the data changes
+@cached_dataset('accidents_user_facts_sample', CARACTERISTIQUES_PATH, USAGERS_PATH)
+def get_user_facts_sample(by=('Severity', 'lum', 'hour'), n=10000, period=None, departments=None):
+	return stratified_sample(get_accidents_user_facts(period=period, departments=departments), by, n)
+
+# Grid index over the accident coordinates, rows in the order of get_accidents_caracteristiques()
+@cached_dataset('accidents_spatial_index', CARACTERISTIQUES_PATH)
+def get_spatial_index(period=None, departments=None):
+	caracteristiques = get_accidents_caracteristiques(('lat', 'long'), period=period, departments=departments)
+	return SpatialIndex(caracteristiques['lat'], caracteristiques['long'])
+
+def intro():
 	# Title and Subtitle with Styling
 	center_h1('🚧 How to Avoid Road Accidents 🛑')
 	center_text("An Analysis of Road Accidents Data in France (2005-2022)")
@@ -69,14 +136,14 @@ def intro(caracteristiques, usagers):
 	# Displaying accident characteristics data
 	with col1:
 		center_h3("Sample Data from 'Accident Characteristics' 📊")
-		AgGrid(caracteristiques.head(10), fit_columns_on_grid_load=True)
+		AgGrid(get_accidents_preview(CARACTERISTIQUES_PATH), fit_columns_on_grid_load=True)
 		st.markdown(
 			"""
 			<div style='text-align: left'>
 				- <strong>num_acc</strong>: Unique accident identifier.<br>
 				- <strong>mois</strong>: Month of the accident.<br>
 				- <strong>jour</strong>: Day of the accident.<br>
-				- <strong>hrmn</strong>: Time of the accident.<br>
+				- <strong>hour/minute</strong>: Time of the accident.<br>
 				- <strong>lum</strong>: Lighting conditions (1: Daylight, 5: Night with lit public lighting).<br>
 				- <strong>agg</strong>: Urban area classification (1: Rural, 9: Urban area with >300,000 inhabitants).<br>
 				- <strong>int</strong>: Type of intersection (e.g., X-intersection, roundabout).<br>
@@ -93,7 +160,7 @@ def intro(caracteristiques, usagers):
 	# Displaying user data from accidents
 	with col2:
 		center_h3("Sample Data from 'Accident Users' 🧑‍🤝‍🧑")
-		AgGrid(usagers.head(10), fit_columns_on_grid_load=True)
+		AgGrid(get_accidents_preview(USAGERS_PATH), fit_columns_on_grid_load=True)
 
 		st.markdown(
 			"""
@@ -116,15 +183,17 @@ def intro(caracteristiques, usagers):
 	st.markdown('---')
 
 	center_h3(" 📊🚦 Number of Accidents Per Month-Year")
-	# set date column
-	caracteristiques['date'] = pd.to_datetime(caracteristiques['annee'].astype(str) + '-' + caracteristiques['mois'].astype(str) + '-' + caracteristiques['jour'].astype(str))
+	# Show the plot
+	plotly_chart(month_year_figure(), use_container_width=True)
 
-	# Extract month and year
-	caracteristiques['month_year'] = caracteristiques['date'].dt.to_period('M')
-	caracteristiques['month_year'] = caracteristiques['month_year'].astype(str)
+	center_text("We can see that the number of accidents has increased over the years. It is interesting to see a current patern through the year, with more accidents happening right before the summer, and many right after the summer.")
 
-	# Group data by month-year
-	accidents_per_month_year = caracteristiques.groupby('month_year').size().reset_index(name='count')
+@cached_figure('accidents_month_year', 'accidents_caracteristiques')
+def month_year_figure():
+	# Group data by month-year ('YYYY-MM')
+	accidents_per_month_year = get_accidents_caracteristiques(('annee', 'mois')).groupby(['annee', 'mois']).size().reset_index(name='count')
+	accidents_per_month_year['month_year'] = (accidents_per_month_year['annee'].astype(str) + '-' +
+											  accidents_per_month_year['mois'].astype(str).str.zfill(2))
 	fig_bar = px.bar(
 		accidents_per_month_year,
 		x='month_year',
@@ -145,11 +214,7 @@ def intro(caracteristiques, usagers):
 		yaxis_title="Number of Accidents",
 		yaxis=dict(showgrid=False)      # Remove horizontal gridlines
 	)
-
-	# Show the plot
-	st.plotly_chart(fig_bar, use_container_width=True)
-
-	center_text("We can see that the number of accidents has increased over the years. It is interesting to see a current patern through the year, with more accidents happening right before the summer, and many right after the summer.")
+	return fig_bar
 
 def Summary_and_outline():
 	st.markdown('---')
@@ -226,10 +291,6 @@ def time_frame_analysis(caracteristiques, usagers):
 	This section explores accident trends over various time dimensions—months, days of the week, and hours of the day. Understanding these patterns can help in pinpointing high-risk periods and improving safety measures.
 	""")
 
-	# Extract additional time information (hour, day of the week)
-	caracteristiques['hour'] = caracteristiques['hrmn'].astype(str).str[:2].astype(float)  # Extract hour
-	caracteristiques['day_of_week'] = caracteristiques['date'].dt.dayofweek  # Monday=0, Sunday=6
-
 	# Create 3 columns layout
 	col1, col2, col3 = st.columns(3)
 
@@ -267,7 +328,7 @@ def time_frame_analysis(caracteristiques, usagers):
 		)
 
 		# Show the plot
-		st.plotly_chart(fig_bar_month, use_container_width=True)
+		plotly_chart(fig_bar_month, use_container_width=True)
 		st.markdown("""
 		**Analysis:** The chart shows a fairly consistent number of accidents across months, with a slight increase in June/July and September/October. This could indicate seasonal variations possibly linked to weather changes or increased travel during holiday seasons.
 		""")
@@ -302,7 +363,7 @@ def time_frame_analysis(caracteristiques, usagers):
 		)
 
 		# Show the plot
-		st.plotly_chart(fig_bar_day, use_container_width=True)
+		plotly_chart(fig_bar_day, use_container_width=True)
 		st.markdown("""
 		**Analysis:** There is a clear peak in accidents on Fridays, suggesting increased activity and mobility as the week ends. The lower accident rates on weekends could reflect less commuter traffic and potentially more cautious driving habits.
 		""")
@@ -333,7 +394,7 @@ def time_frame_analysis(caracteristiques, usagers):
 		)
 
 		# Show the plot
-		st.plotly_chart(fig_bar_hour, use_container_width=True)
+		plotly_chart(fig_bar_hour, use_container_width=True)
 		st.markdown("""
 		**Analysis:** The hourly data shows significant peaks during evening rush hours, with the highest peak around 5 PM. This indicates that the majority of accidents occur when traffic density is highest, suggesting a need for increased traffic management during these times. We will further this analysis when checking the types of commutings that are more prone to accidents.
 		""")
@@ -349,7 +410,7 @@ def location_based_analysis(caracteristiques, usagers):
 	# Analysis by Department
 	with col1:
 		center_h3("Accidents by Department")
-		accidents_by_dept = caracteristiques.groupby('dep').size().reset_index(name='count').sort_values('count', ascending=False)
+		accidents_by_dept = caracteristiques.groupby('dep', observed=True).size().reset_index(name='count').sort_values('count', ascending=False)
 		fig_dept = px.bar(
 			accidents_by_dept, 
 			x='dep', 
@@ -361,7 +422,7 @@ def location_based_analysis(caracteristiques, usagers):
 			color_continuous_scale='Turbo'  # Color gradient based on count
 		)
 
-		st.plotly_chart(fig_dept, use_container_width=True)
+		plotly_chart(fig_dept, use_container_width=True)
 		st.markdown("""
 		**Analysis:** This chart ranks departments by the number of accidents, highlighting regions with higher accident frequencies. Departments with major urban centers or high traffic volumes often show more accidents.
 		""")
@@ -380,7 +441,7 @@ def location_based_analysis(caracteristiques, usagers):
 			color_discrete_sequence=px.colors.sequential.RdBu,
 			
 		)
-		st.plotly_chart(fig_area, use_container_width=True)
+		plotly_chart(fig_area, use_container_width=True)
 		st.markdown("""
 		**Analysis:** The pie chart shows the distribution of accidents between urban and rural areas, providing insights into where interventions may be most needed.
 		""")
@@ -416,7 +477,7 @@ def location_based_analysis(caracteristiques, usagers):
 		)
 
 		# Show the plot
-		st.plotly_chart(fig_light, use_container_width=True)
+		plotly_chart(fig_light, use_container_width=True)
 
 		# Add analysis commentary
 		st.markdown("""
@@ -440,7 +501,7 @@ def location_based_analysis(caracteristiques, usagers):
 			color='count',
 			color_continuous_scale='Viridis'  # Color gradient based on count
 		)
-		st.plotly_chart(fig_intersection, use_container_width=True)
+		plotly_chart(fig_intersection, use_container_width=True)
 		st.markdown("""
 		**Analysis:** The bar chart provides insights into which types of intersections are most prone to accidents. This information can guide traffic flow improvements and signage enhancements.
 		""")
@@ -448,20 +509,32 @@ def location_based_analysis(caracteristiques, usagers):
 	# Map Plot using lat/long
 	center_h3("Geographical Distribution of Accidents")
 	
-	# Filter the data for non-null lat and long, and valid coordinates
-	accidents_map = caracteristiques.dropna(subset=['lat', 'long'])
-	accidents_map = accidents_map[(accidents_map['lat'] > -90) & (accidents_map['lat'] < 90) & 
-								  (accidents_map['long'] > -180) & (accidents_map['long'] < 180)]
-	
-	accidents_map = accidents_map[
-		(accidents_map['lat'].between(41, 51)) & 
-		(accidents_map['long'].between(-5, 10))
-	]
-	
+	# Area shown on the map: the whole of France or the surroundings of a city
+	city_centers = {
+		'Paris': (48.8566, 2.3522), 'Marseille': (43.2965, 5.3698), 'Lyon': (45.7640, 4.8357),
+		'Toulouse': (43.6047, 1.4442), 'Nice': (43.7102, 7.2620), 'Nantes': (47.2184, -1.5536),
+		'Strasbourg': (48.5734, 7.7521), 'Bordeaux': (44.8378, -0.5792), 'Lille': (50.6292, 3.0573),
+	}
+	col1, col2 = st.columns(2)
+	with col1:
+		area = st.selectbox("Area", ['France'] + list(city_centers))
+	with col2:
+		radius = st.slider("Radius around the city (km)", 1, 50, 10, disabled=area == 'France')
+
+	# Viewport query on the spatial index, then a deterministic, density-preserving thinning
+	spatial_index = get_spatial_index(**data_filters())
+	if area == 'France':
+		positions = spatial_index.bbox(*FRANCE_BBOX)
+		center, zoom = {"lat": 46, "lon": 2.5}, 5
+	else:
+		lat, lon = city_centers[area]
+		positions = spatial_index.radius(lat, lon, radius)
+		center, zoom = {"lat": lat, "lon": lon}, 12 - math.log2(radius) if radius > 1 else 12
+
 	sample_size = 5000
-	# Sampling the data to reduce the number of points plotted
-	if len(accidents_map) > sample_size:
-		accidents_map = accidents_map.sample(n=sample_size)
+	shown = spatial_index.thin(positions, sample_size)
+	accidents_map = caracteristiques.iloc[shown]
+	center_text(f"Showing {len(shown):,} of the {len(positions):,} accidents of the area")
 
 		# Mapping from 'lum' codes to descriptive names (make sure these are correct)
 	light_mapping = {
@@ -471,7 +544,7 @@ def location_based_analysis(caracteristiques, usagers):
 		4: 'Night with public lighting not lit',
 		5: 'Night with public lighting lit'
 	}
-	accidents_map['light_condition'] = accidents_map['lum'].map(light_mapping)
+	accidents_map = accidents_map.assign(light_condition=accidents_map['lum'].map(light_mapping))
 
 	# Plot the map using open-street-map style (no token required)
 	fig_map = px.scatter_mapbox(
@@ -482,17 +555,17 @@ def location_based_analysis(caracteristiques, usagers):
 			color_discrete_sequence=px.colors.qualitative.Light24,  # A color palette that is easy to distinguish
 			hover_name="num_acc",
 			hover_data={"lat": False, "long": False, "light_condition": True},  # Customize hover data
-			zoom=5,
+			zoom=zoom,
 			height=600,
 			title="Map of Accident Locations by Lighting Condition"
 		)
 	fig_map.update_layout(
 		mapbox_style="open-street-map",
-		mapbox_zoom=5,
-		mapbox_center={"lat": 46, "lon": 2.5},  # Centered on France
+		mapbox_zoom=zoom,
+		mapbox_center=center,  # Centered on the selected area
 		margin={"r":0, "t":0, "l":0, "b":0}
 	)
-	st.plotly_chart(fig_map, use_container_width=True)
+	plotly_chart(fig_map, use_container_width=True)
 	
 	col1, col2 = st.columns(2)
 	with col1:
@@ -543,24 +616,12 @@ def location_based_analysis(caracteristiques, usagers):
 	)
 
 def weather_conditions_analysis(caracteristiques, usagers):
-	# Merge the dataframes on the accident identifier
-	merged_data = pd.merge(caracteristiques, usagers.drop(columns=["annee"]), on='num_acc', how='right')
-
 	center_text("The two following plots contain the same data. The first one is grouped by severity, while the second one is grouped by weather condition. This highlights the impact of weather conditions on accident severity.")
 
 	col1, col2 = st.columns(2)
 
-	weather_map = {1: 'Normal', 2: 'Light Rain', 3: 'Heavy Rain', 4: 'Snow/Hail', 5: 'Fog/Smoke', 6: 'Strong Wind/Storm', 7: 'Dazzling', 8: 'Cloudy', 9: 'Other'}
-	severity_map = {1: 'Unharmed', 2: 'Killed', 3: 'Hospitalized', 4: 'Light Injury'}
-	
-	merged_data['Weather Condition'] = merged_data['atm'].map(weather_map)
-	merged_data['Severity'] = merged_data['grav'].map(severity_map)
-
-	# Severity distribution by Weather Condition
-	severity_distribution = pd.crosstab(merged_data['Weather Condition'], merged_data['Severity'])
-
 	# Create a crosstab of weather condition vs severity
-	severity_distribution = pd.crosstab(merged_data['Weather Condition'], merged_data['Severity'])
+	severity_distribution = get_crosstab('Weather Condition', 'Severity', **data_filters())
 
 	# Normalize the data to get percentages
 	severity_distribution_percentage = severity_distribution.div(severity_distribution.sum(axis=1), axis=0) * 100
@@ -595,7 +656,7 @@ def weather_conditions_analysis(caracteristiques, usagers):
 
 	with col1:
 		center_h3("Percentage of Accident Severity by Weather Condition (Grouped by Severity)")
-		st.plotly_chart(fig_severity, use_container_width=True)
+		plotly_chart(fig_severity, use_container_width=True)
 
 	# Second plot: Grouped by Weather Condition
 	fig_weather = px.bar(
@@ -618,15 +679,15 @@ def weather_conditions_analysis(caracteristiques, usagers):
 	)
 	with col2:
 		center_h3("Percentage of Accident Severity by Weather Condition (Grouped by Weather)")
-		st.plotly_chart(fig_weather, use_container_width=True)
+		plotly_chart(fig_weather, use_container_width=True)
 
 	# Yearly analysis using 'annee'
-	yearly_weather = pd.crosstab(merged_data['annee'], merged_data['Weather Condition'])
+	yearly_weather = get_crosstab('annee', 'Weather Condition', **data_filters())
 	fig_yearly = px.line(yearly_weather, title='')
 	fig_yearly.update_layout(xaxis_title='Year', yaxis_title='Number of Accidents')
 	with col1:
 		center_h3("Yearly Analysis of Accidents by Weather Condition")
-		st.plotly_chart(fig_yearly, use_container_width=True)
+		plotly_chart(fig_yearly, use_container_width=True)
 
 	for col in yearly_weather.columns:
 		yearly_weather[col] = yearly_weather[col] / yearly_weather[col].iloc[0] * 100
@@ -636,7 +697,7 @@ def weather_conditions_analysis(caracteristiques, usagers):
 	fig_yearly.update_layout(xaxis_title='Year', yaxis_title='Number of Accidents')
 	with col2:
 		center_h3("Yearly Analysis of Accidents by Weather Condition (rebased)")
-		st.plotly_chart(fig_yearly, use_container_width=True)
+		plotly_chart(fig_yearly, use_container_width=True)
 
 	st.markdown(
 		"""
@@ -651,40 +712,34 @@ def weather_conditions_analysis(caracteristiques, usagers):
 		unsafe_allow_html=True
 	)
 
-def collision_analysis(caracteristiques, usagers):
-	# Merge the dataframes on the accident identifier
-	merged_data = pd.merge(caracteristiques, usagers.drop(columns=["annee"]), on='num_acc', how='right')
-
-	# Map for collision types (col)
-	collision_map = {
-		1: 'Two vehicles - head-on', 
-		2: 'Two vehicles - rear-end', 
-		3: 'Two vehicles - side impact', 
-		4: 'Chain collision (3+ vehicles)', 
-		5: 'Multiple collisions (3+ vehicles)', 
-		6: 'Other collision', 
-		7: 'No collision'
-	}
+@cached_figure('accidents_collision_weather', 'accidents_user_facts')
+def collision_weather_heatmap(period=None, departments=None):
+	# Create a crosstab of Collision Type vs Weather Condition
+	heatmap_data = get_crosstab('Collision Type', 'Weather Condition', period=period, departments=departments)
 
-	# Map for weather conditions (atm)
-	weather_map = {
-		1: 'Normal', 
-		2: 'Light Rain', 
-		3: 'Heavy Rain', 
-		4: 'Snow/Hail',
-		5: 'Fog/Smoke',
-		6: 'Strong Wind/Storm',
-		7: 'Dazzling',
-		8: 'Cloudy',
-		9: 'Other'
-	}
+	# Normalize the data by columns to see the proportion of each collision type per weather condition
+	heatmap_data = heatmap_data.div(heatmap_data.sum(axis=0), axis=1)
 
-	# Map for severity (grav)
-	severity_map = {1: 'Unharmed', 2: 'Killed', 3: 'Hospitalized', 4: 'Light Injury'}
+	# Generate the heatmap
+	fig = px.imshow(heatmap_data, 
+					labels=dict(x="Weather Condition", y="Collision Type", color="Proportion"),
+					x=heatmap_data.columns, 
+					y=heatmap_data.index,
+					aspect="auto",
+					title="")
+	fig.update_xaxes(side="bottom")
 
-	merged_data['Collision Type'] = merged_data['col'].map(collision_map)
-	merged_data['Weather Condition'] = merged_data['atm'].map(weather_map)
-	merged_data['Severity'] = merged_data['grav'].map(severity_map)
+	fig.update_layout(
+		xaxis_title='Weather Condition',
+		yaxis_title='Collision Type',
+		coloraxis_colorbar={
+			'title': 'Proportion'
+		}
+	)
+	return fig
+
+def collision_analysis(caracteristiques, usagers):
+	merged_data = get_accidents_user_facts(**data_filters())
 
 	col1, col2 = st.columns(2)
 
@@ -704,12 +759,12 @@ def collision_analysis(caracteristiques, usagers):
 							   title='',
 							   template='plotly_dark')
 		fig_collision.update_layout(xaxis_tickangle=-45)
-		st.plotly_chart(fig_collision, use_container_width=True)
+		plotly_chart(fig_collision, use_container_width=True)
 
 	# 2. Severity of Accidents by Collision Type
 	with col2:
 		center_h3("Severity of Accidents by Collision Type")
-		severity_collision_distribution = pd.crosstab(merged_data['Collision Type'], merged_data['Severity'])
+		severity_collision_distribution = get_crosstab('Collision Type', 'Severity', **data_filters())
 		severity_collision_percentage = severity_collision_distribution.div(severity_collision_distribution.sum(axis=1), axis=0) * 100
 		
 		# Reset index and convert wide to long format
@@ -725,14 +780,14 @@ def collision_analysis(caracteristiques, usagers):
 							  labels={'Percentage': 'Percentage of Accidents', 'Collision Type': 'Collision Type'},
 							  template='plotly_dark')
 		fig_severity.update_layout(xaxis_tickangle=-45)
-		st.plotly_chart(fig_severity, use_container_width=True)
+		plotly_chart(fig_severity, use_container_width=True)
 
 
 
 	# Yearly Trends of Collision Types
 	with col1:
 		center_h3("Yearly Trends of Collision Types")
-		yearly_collision = pd.crosstab(merged_data['annee'], merged_data['Collision Type'])
+		yearly_collision = get_crosstab('annee', 'Collision Type', **data_filters())
 		yearly_collision_percentage = yearly_collision.div(yearly_collision.sum(axis=1), axis=0) * 100
 		yearly_collision_melted = yearly_collision_percentage.reset_index().melt(id_vars='annee', 
 																				var_name='Collision Type', 
@@ -744,34 +799,13 @@ def collision_analysis(caracteristiques, usagers):
 									title='',
 									labels={'Percentage': 'Percentage of Accidents', 'annee': 'Year'},
 									template='plotly_dark')
-		st.plotly_chart(fig_yearly_collision, use_container_width=True)
-
-	# Create a crosstab of Collision Type vs Weather Condition
-	heatmap_data = pd.crosstab(merged_data['Collision Type'], merged_data['Weather Condition'])
+		plotly_chart(fig_yearly_collision, use_container_width=True)
 
-	# Normalize the data by columns to see the proportion of each collision type per weather condition
-	heatmap_data = heatmap_data.div(heatmap_data.sum(axis=0), axis=1)
-
-	# Generate the heatmap
-	fig = px.imshow(heatmap_data, 
-					labels=dict(x="Weather Condition", y="Collision Type", color="Proportion"),
-					x=heatmap_data.columns, 
-					y=heatmap_data.index,
-					aspect="auto",
-					title="")
-	fig.update_xaxes(side="bottom")
-
-	fig.update_layout(
-		xaxis_title='Weather Condition',
-		yaxis_title='Collision Type',
-		coloraxis_colorbar={
-			'title': 'Proportion'
-		}
-	)
+	fig = collision_weather_heatmap(**data_filters())
 	with col2:
 		center_h3("Proportion of Collision Types by Weather Conditions")
 		# Display the heatmap in the Streamlit app
-		st.plotly_chart(fig, use_container_width=True)
+		plotly_chart(fig, use_container_width=True)
 
 	# Conclusion with insights
 	st.markdown(
@@ -789,75 +823,56 @@ def collision_analysis(caracteristiques, usagers):
 	)
 
 def demographic_analysis(caracteristiques, usagers):
-	# Merge the dataframes on the accident identifier
-	merged_data = pd.merge(caracteristiques, usagers, on='num_acc', how='right')
+	merged_data = get_accidents_user_facts(**data_filters())
 
 	col1, col2 = st.columns(2)
 
 	# Gender distribution in accidents
 	with col1:
 		center_h3("Gender Distribution in Accidents")
-		gender_map = {1: 'Male', 2: 'Female'}
-		merged_data['sexe'] = merged_data['sexe'].map(gender_map)
-
-		fig_gender = px.pie(merged_data, names='sexe', title='Accidents by Gender',
-							labels={'sexe': 'Gender'}, hole=0.4,
+		fig_gender = px.pie(merged_data, names='Gender', title='Accidents by Gender',
+							hole=0.4,
 							color_discrete_sequence=px.colors.sequential.RdBu)
-		st.plotly_chart(fig_gender, use_container_width=True)
+		plotly_chart(fig_gender, use_container_width=True)
 
 	# Age distribution in accidents
 	with col2:
 		center_h3("Age Distribution in Accidents")
-		# Ensure age data is cleaned and cast to appropriate type
-		merged_data['age'] = pd.to_datetime('today').year - merged_data['an_nais']
 		fig_age = px.histogram(merged_data, x='age', nbins=20,
 							   title='',
 							   labels={'age': 'Age'}, template='plotly_dark')
 		fig_age.update_layout(xaxis_title='Age', yaxis_title='Count')
-		st.plotly_chart(fig_age, use_container_width=True)
+		plotly_chart(fig_age, use_container_width=True)
 
 	# Severity of injuries by age
 	with col1:
 		center_h3("Severity of Injuries by Age")
-		severity_map = {1: 'Unharmed', 2: 'Killed', 3: 'Hospitalized', 4: 'Light Injury'}
-		merged_data['Severity'] = merged_data['grav'].map(severity_map)
-
-		fig_severity_age = px.box(merged_data.sample(10000), x='Severity', y='age', color='Severity',
+		severity_sample = get_user_facts_sample(**data_filters())
+		fig_severity_age = px.box(severity_sample, x='Severity', y='age', color='Severity',
 								title='',
 								labels={'age': 'Age', 'Severity': 'Severity'})
 		fig_severity_age.update_layout(xaxis_title='Severity', yaxis_title='Age')
-		st.plotly_chart(fig_severity_age, use_container_width=True)
+		plotly_chart(fig_severity_age, use_container_width=True)
 
 	# Severity of injuries by gender
 	with col2:
 		center_h3("Severity of Injuries by Gender")
-		severity_gender_distribution = pd.crosstab(merged_data['sexe'], merged_data['Severity'], normalize='index') * 100
+		severity_gender_distribution = get_crosstab('Gender', 'Severity', 'index', **data_filters()) * 100
 		fig_severity_gender = px.bar(severity_gender_distribution, barmode='group',
 									title='',
-									labels={'value': 'Percentage of Accidents', 'sexe': 'Gender', 'Severity': 'Severity'},
+									labels={'value': 'Percentage of Accidents', 'Gender': 'Gender', 'Severity': 'Severity'},
 									template='plotly_dark')
 		fig_severity_gender.update_layout(xaxis_title='Gender', yaxis=dict(ticksuffix='%'))
-		st.plotly_chart(fig_severity_gender, use_container_width=True)
+		plotly_chart(fig_severity_gender, use_container_width=True)
 
 	center_h3("Collision Types by Gender")
-	collision_map = {
-		1: 'Two vehicles - head-on', 
-		2: 'Two vehicles - rear-end', 
-		3: 'Two vehicles - side impact', 
-		4: 'Chain collision (3+ vehicles)', 
-		5: 'Multiple collisions (3+ vehicles)', 
-		6: 'Other collision', 
-		7: 'No collision'
-	}
-	merged_data['Collision Type'] = merged_data['col'].map(collision_map)
-
-	collision_gender_distribution = pd.crosstab(merged_data['Collision Type'], merged_data['sexe'], normalize='columns') * 100
+	collision_gender_distribution = get_crosstab('Collision Type', 'Gender', 'columns', **data_filters()) * 100
 	fig_collision_gender = px.bar(collision_gender_distribution, barmode='group',
 									title='Collision Types by Gender (Normalized by Gender)',
 									labels={'value': 'Percentage of Accidents', 'Collision Type': 'Collision Type'},
 									template='plotly_dark')
 	fig_collision_gender.update_layout(xaxis_tickangle=-45)
-	st.plotly_chart(fig_collision_gender, use_container_width=True)
+	plotly_chart(fig_collision_gender, use_container_width=True)
 
 	# Conclusion with insights
 	st.markdown(
@@ -874,26 +889,7 @@ def demographic_analysis(caracteristiques, usagers):
 	)
 
 def vehicle_positioning_analysis(caracteristiques, usagers):
-	# Merge the dataframes on the accident identifier
-	merged_data = pd.merge(caracteristiques, usagers, on='num_acc', how='left')
-
-	# Mapping position in vehicle
-	position_map = {
-		1: 'Driver',
-		2: 'Front Passenger',
-		3: 'Rear Left',
-		4: 'Rear Center',
-		5: 'Rear Right',
-		6: 'Middle Left',
-		7: 'Middle Right',
-		8: 'Other Position',
-		9: 'Unspecified'
-	}
-	merged_data['Position in Vehicle'] = merged_data['place'].map(position_map)
-
-	# Mapping severity
-	severity_map = {1: 'Unharmed', 2: 'Killed', 3: 'Hospitalized', 4: 'Light Injury'}
-	merged_data['Severity'] = merged_data['grav'].map(severity_map)
+	merged_data = get_accidents_user_facts(**data_filters())
 
 	col1, col2 = st.columns(2)
 
@@ -905,19 +901,19 @@ def vehicle_positioning_analysis(caracteristiques, usagers):
 							  labels={'index': 'Position in Vehicle', 'value': 'Percentage'},
 							  title='Positional Distribution of Occupants in Accidents')
 		fig_position.update_layout(xaxis_title='Position in Vehicle', yaxis=dict(ticksuffix='%'))
-		st.plotly_chart(fig_position, use_container_width=True)
+		plotly_chart(fig_position, use_container_width=True)
 
 	# Severity of Injuries by Position in Vehicle
 	with col2:
 		center_h3("Severity of Injuries by Position in Vehicle")
-		severity_position_distribution = pd.crosstab(merged_data['Position in Vehicle'], merged_data['Severity'])
+		severity_position_distribution = get_crosstab('Position in Vehicle', 'Severity', **data_filters())
 		severity_position_percentage = severity_position_distribution.div(severity_position_distribution.sum(axis=1), axis=0) * 100
 		fig_severity_position = px.bar(severity_position_percentage.reset_index().melt(id_vars='Position in Vehicle'),
 									   x='Position in Vehicle', y='value', color='Severity',
 									   title='Severity of Injuries by Position in Vehicle',
 									   barmode='group')
 		fig_severity_position.update_layout(xaxis_tickangle=-45, yaxis=dict(ticksuffix='%'))
-		st.plotly_chart(fig_severity_position, use_container_width=True)
+		plotly_chart(fig_severity_position, use_container_width=True)
 
 	# Conclusion with insights
 	st.markdown(
@@ -935,24 +931,7 @@ def vehicle_positioning_analysis(caracteristiques, usagers):
 	)
 
 def trip_purpose_analysis(caracteristiques, usagers):
-	# Merge the dataframes on the accident identifier
-	merged_data = pd.merge(caracteristiques, usagers, on='num_acc', how='left')
-
-	# Mapping trip purposes
-	purpose_map = {
-		1: 'Home to work',
-		2: 'Home to school',
-		3: 'Shopping',
-		4: 'Professional',
-		5: 'Leisure',
-		6: 'Other',
-		7: 'Unknown'
-	}
-	merged_data['Trip Purpose'] = merged_data['trajet'].map(purpose_map)
-
-	# Mapping severity
-	severity_map = {1: 'Unharmed', 2: 'Killed', 3: 'Hospitalized', 4: 'Light Injury'}
-	merged_data['Severity'] = merged_data['grav'].map(severity_map)
+	merged_data = get_accidents_user_facts(**data_filters())
 
 	col1, col2 = st.columns(2)
 
@@ -964,26 +943,24 @@ def trip_purpose_analysis(caracteristiques, usagers):
 							 labels={'index': 'Trip Purpose', 'value': 'Percentage'},
 							 title='Distribution of Trip Purposes in Accidents')
 		fig_purpose.update_layout(xaxis_title='Trip Purpose', yaxis=dict(ticksuffix='%'))
-		st.plotly_chart(fig_purpose, use_container_width=True)
+		plotly_chart(fig_purpose, use_container_width=True)
 
 	# Severity of Injuries by Trip Purpose
 	with col2:
 		center_h3("Severity of Injuries by Trip Purpose")
-		severity_purpose_distribution = pd.crosstab(merged_data['Trip Purpose'], merged_data['Severity'])
+		severity_purpose_distribution = get_crosstab('Trip Purpose', 'Severity', **data_filters())
 		severity_purpose_percentage = severity_purpose_distribution.div(severity_purpose_distribution.sum(axis=1), axis=0) * 100
 		fig_severity_purpose = px.bar(severity_purpose_percentage.reset_index().melt(id_vars='Trip Purpose'),
 									  x='Trip Purpose', y='value', color='Severity',
 									  title='Severity of Injuries by Trip Purpose',
 									  barmode='group')
 		fig_severity_purpose.update_layout(xaxis_tickangle=-45, yaxis=dict(ticksuffix='%'))
-		st.plotly_chart(fig_severity_purpose, use_container_width=True)
+		plotly_chart(fig_severity_purpose, use_container_width=True)
 
 	center_h3("Distribution of Trip Purposes by Gender")
-	gender_map = {1:"Male", 2:"Female"}
-	merged_data['Gender'] = merged_data['sexe'].map(gender_map)
-	
+
 	# Normalize by gender
-	trip_gender_distribution = pd.crosstab(merged_data['Trip Purpose'], merged_data['Gender'], normalize='columns') * 100
+	trip_gender_distribution = get_crosstab('Trip Purpose', 'Gender', 'columns', **data_filters()) * 100
 	
 	# Create the bar plot
 	fig_trip_gender = px.bar(trip_gender_distribution.reset_index().melt(id_vars='Trip Purpose'),
@@ -992,7 +969,7 @@ def trip_purpose_analysis(caracteristiques, usagers):
 							labels={'value': 'Percentage', 'Gender': 'Gender'},
 							barmode='group')
 	fig_trip_gender.update_layout(xaxis_tickangle=-45, yaxis=dict(ticksuffix='%'))
-	st.plotly_chart(fig_trip_gender, use_container_width=True)
+	plotly_chart(fig_trip_gender, use_container_width=True)
 
 
 	# Conclusion with insights
@@ -1010,66 +987,37 @@ def trip_purpose_analysis(caracteristiques, usagers):
 		unsafe_allow_html=True
 	)
 
-def calculate_risk(hour, gender, department, urban_rural, weather, age, trip_reason, caracteristiques, usagers):
-# Normalize each risk to be between 0 and 1
+# Normalized frequencies of every risk dimension, built once per data version
+@cached_dataset('accidents_risk_index', CARACTERISTIQUES_PATH, USAGERS_PATH)
+def get_risk_index(period=None, departments=None):
+	return RiskIndex(get_accidents_caracteristiques(RISK_COLUMNS['caracteristiques'], period=period, departments=departments),
+					 get_accidents_usagers(RISK_COLUMNS['usagers'], period=period, departments=departments))
+
+# Sparse joint counts over all the risk dimensions, built once per data version
+@cached_dataset('accidents_risk_cube', CARACTERISTIQUES_PATH, USAGERS_PATH)
+def get_risk_cube(period=None, departments=None):
+	return RiskCube(get_accidents_caracteristiques(RISK_COLUMNS['caracteristiques'], period=period, departments=departments),
+					get_accidents_usagers(RISK_COLUMNS['usagers'], period=period, departments=departments))
 
-	# Hour risk
+def calculate_joint_risk(hour, gender, department, urban_rural, weather, age, trip_reason):
 	hour = int(hour.split(":")[0]) if hour != "Any" else "Any"
-	caracteristiques['hour'] = caracteristiques['hrmn'].apply(lambda x: int(str(x).split(":")[0]))
-	grouped_hour = caracteristiques.groupby('hour')['num_acc'].count()
-	grouped_hour = grouped_hour / grouped_hour.sum()
-	hour_risk = (grouped_hour[hour] - grouped_hour.min()) / (grouped_hour.max() - grouped_hour.min()) if hour in grouped_hour.index else grouped_hour.mean()
-
-	# Gender risk
-	grouped_sexe = usagers.groupby('sexe')['num_acc'].count()
-	grouped_sexe = grouped_sexe / grouped_sexe.sum()
-	gender_risk = (grouped_sexe.iloc[1 if gender == "Male" else 2] - grouped_sexe.min()) / (grouped_sexe.max() - grouped_sexe.min()) if gender in ['Male', 'Female'] else grouped_sexe.mean()
-
-	# Department risk
-	grouped_department = caracteristiques.groupby('dep')['num_acc'].count()
-	grouped_department = grouped_department / grouped_department.sum()
-	department_risk = (grouped_department[int(department)] - grouped_department.min()) / (grouped_department.max() - grouped_department.min()) if department in grouped_department.index else grouped_department.mean()
-
-	# Urban/Rural risk
-	grouped_urban_rural = caracteristiques.groupby('agg')['num_acc'].count()
-	grouped_urban_rural = grouped_urban_rural / grouped_urban_rural.sum()
-	urban_rural_risk = (grouped_urban_rural[2 if urban_rural == "Urban" else 1] - grouped_urban_rural.min()) / (grouped_urban_rural.max() - grouped_urban_rural.min()) if urban_rural in ['Urban', 'Rural'] else grouped_urban_rural.mean()
-
-	# Weather risk
-	weather_map = {1: 'Normal', 2: 'Light Rain', 3: 'Heavy Rain', 4: 'Snow/Hail', 5: 'Fog/Smoke', 6: 'Strong Wind/Storm', 7: 'Dazzling', 8: 'Cloudy', 9: 'Other'}
-	caracteristiques['Weather Condition'] = caracteristiques['atm'].map(weather_map)
-	grouped_weather = caracteristiques.groupby('Weather Condition')['num_acc'].count()
-	grouped_weather = grouped_weather / grouped_weather.sum()
-	weather_risk = (grouped_weather[weather] - grouped_weather.min()) / (grouped_weather.max() - grouped_weather.min()) if weather in grouped_weather.index else grouped_weather.mean()
-
-	# Age risk
-	usagers['Age'] = pd.to_datetime('today').year - usagers['an_nais']
-	usagers['Age Group'] = pd.cut(usagers['Age'], bins=[0, 14, 17, 24, 34, 44, 54, 64, 74, 100], labels=['0-14', '15-17', '18-24', '25-34', '35-44', '45-54', '55-64', '65-74', '75+'])
-	grouped_age = usagers.groupby('Age Group')['num_acc'].count()
-	grouped_age = grouped_age / grouped_age.sum()
-	age_risk = (grouped_age[age] - grouped_age.min()) / (grouped_age.max() - grouped_age.min()) if age in grouped_age.index else grouped_age.mean()
-
-	# Trip Purpose risk
-	trip_map = {1: 'Home to work', 2: 'Home to school', 3: 'Shopping', 4: 'Professional', 5: 'Leisure', 6: 'Other', 7: 'Unknown'}
-	usagers['Trip Purpose'] = usagers['trajet'].map(trip_map)
-	grouped_trip = usagers.groupby('Trip Purpose')['num_acc'].count()
-	grouped_trip = grouped_trip / grouped_trip.sum()
-	trip_risk = (grouped_trip[trip_reason] - grouped_trip.min()) / (grouped_trip.max() - grouped_trip.min()) if trip_reason in grouped_trip.index else grouped_trip.mean()
-
-	# Calculate total risk score using a weighted sum to ensure the score is between 0 and 1
-	total_risk = (0.15 * hour_risk + 0.15 * gender_risk + 0.15 * department_risk +
-				  0.15 * urban_rural_risk + 0.15 * weather_risk + 0.15 * age_risk + 
-				  0.1 * trip_risk)
-	
+	return get_risk_cube(**data_filters()).query(hour=hour, gender=gender, department=department, urban_rural=urban_rural,
+								 weather=weather, age=age, trip_reason=trip_reason)
+
+def calculate_risk(hour, gender, department, urban_rural, weather, age, trip_reason):
+	# Each risk is normalized between 0 and 1
+	hour = int(hour.split(":")[0]) if hour != "Any" else "Any"
+	risks = get_risk_index(**data_filters()).score(hour=hour, gender=gender, department=department, urban_rural=urban_rural,
+								   weather=weather, age=age, trip_reason=trip_reason)
 	return (
-		hour_risk,
-		gender_risk,
-		department_risk,
-		urban_rural_risk,
-		weather_risk,
-		age_risk,
-		trip_risk,
-		total_risk
+		risks['hour'],
+		risks['gender'],
+		risks['department'],
+		risks['urban_rural'],
+		risks['weather'],
+		risks['age'],
+		risks['trip_reason'],
+		risks['total']
 	)
 
 
@@ -1119,7 +1067,7 @@ def conclusion(caracteristiques, usagers):
 		trip_reason = st.selectbox('Reason for travelling', ["Any", 'Leisure', 'Work', 'Professional', 'Other'])
 
 	# Calculate risk
-	hour_risk, gender_risk, department_risk, urban_rural_risk, weather_risk, age_risk, trip_risk, total_risk = calculate_risk(hour, gender, department, urban_rural, weather, age, trip_reason, caracteristiques, usagers)
+	hour_risk, gender_risk, department_risk, urban_rural_risk, weather_risk, age_risk, trip_risk, total_risk = calculate_risk(hour, gender, department, urban_rural, weather, age, trip_reason)
 
 		# Function to format and color the risks
 	def format_risk(risk_value):
@@ -1160,6 +1108,21 @@ def conclusion(caracteristiques, usagers):
 	# Output risk result
 	center_h3("Total Risk Score : " +format_risk(total_risk*100) )
 
+	# Joint frequencies of the whole profile, rather than of each factor on its own
+	joint_risk = calculate_joint_risk(hour, gender, department, urban_rural, weather, age, trip_reason)
+	cols = st.columns(3)
+	if joint_risk['victims'] == 0:
+		# Lift and severe injury rate are undefined without any matching victim
+		with cols[0]:
+			st.markdown("**Victims matching your profile:** no matching victims")
+	else:
+		with cols[0]:
+			st.markdown(f"**Victims matching your profile:** {joint_risk['victims']:,} ({joint_risk['share']*100:.3f}% of all victims)")
+		with cols[1]:
+			st.markdown(f"**Compared to independent factors:** ×{joint_risk['lift']:.2f}")
+		with cols[2]:
+			st.markdown(f"**Severe injury rate:** {joint_risk['severe_rate']*100:.1f}%")
+
 	"""# Customize result display
 	if risk_percentage < 30:
 		st.success("Low risk 🚗")
@@ -1178,33 +1141,49 @@ def conclusion(caracteristiques, usagers):
 		- **Age Risk**: Compares the selected age group's accident frequency to the average.
 		- **Trip Purpose Risk**: Compares the selected trip purpose's accident frequency to the average.
 		- **Total Risk**: Combines all individual risks to calculate the total risk score. The higher the score, the higher the risk. The score is then log-transformed for better interpretation.
+		- **Victims matching your profile**: Number of accident victims matching every selected factor at once.
+		- **Compared to independent factors**: How much more (above 1) or less (below 1) often the whole profile appears than if the selected factors were unrelated.
+		- **Severe injury rate**: Share of the matching victims who were killed or hospitalized.
 		""")
 
 # Create a dictionary to link titles to functions
+# Every section with the columns it reads from each table (None: the table is not needed,
+# the sections built on the user facts load them on their own)
 analysis_parts = {
-	"🕒 1. Time Frame Analysis": time_frame_analysis,
-	"📍 2. Location-Based Analysis": location_based_analysis,
-	"☔ 3. Weather Conditions Analysis": weather_conditions_analysis,
-	"💥 4. Collision Analysis": collision_analysis,
-	"👥 5. Demographic Analysis": demographic_analysis,
-	"🛑 6. Vehicle and Occupant Positioning": vehicle_positioning_analysis,
-	"🚗 7. Trip Purpose Analysis": trip_purpose_analysis,
-	"🔚 8. Conclusion": conclusion
+	"🕒 1. Time Frame Analysis": {'function': time_frame_analysis, 'caracteristiques': ('mois', 'day_of_week', 'hour'), 'usagers': None},
+	"📍 2. Location-Based Analysis": {'function': location_based_analysis, 'caracteristiques': ('num_acc', 'dep', 'agg', 'lum', 'int', 'lat', 'long'), 'usagers': None},
+	"☔ 3. Weather Conditions Analysis": {'function': weather_conditions_analysis, 'caracteristiques': None, 'usagers': None},
+	"💥 4. Collision Analysis": {'function': collision_analysis, 'caracteristiques': None, 'usagers': None},
+	"👥 5. Demographic Analysis": {'function': demographic_analysis, 'caracteristiques': None, 'usagers': None},
+	"🛑 6. Vehicle and Occupant Positioning": {'function': vehicle_positioning_analysis, 'caracteristiques': None, 'usagers': None},
+	"🚗 7. Trip Purpose Analysis": {'function': trip_purpose_analysis, 'caracteristiques': None, 'usagers': None},
+	"🔚 8. Conclusion": {'function': conclusion, 'caracteristiques': ('dep',), 'usagers': None}
 }
 
+def load_section_data(part):
+	# Only the tables, and the columns of them, that the section declared
+	filters = data_filters()
+	caracteristiques = get_accidents_caracteristiques(part['caracteristiques'], **filters) if part['caracteristiques'] is not None else None
+	usagers = get_accidents_usagers(part['usagers'], **filters) if part['usagers'] is not None else None
+	return caracteristiques, usagers
 
 
 # Main Accident Page Function
 def accidents():
-	caracteristiques = get_accidents_caracteristiques()
-	usagers = get_accidents_usagers()
-	
-
-	intro(caracteristiques, usagers)
+	intro()
 	Summary_and_outline()
 	selected_part = st.selectbox("Choose a section to explore:", list(analysis_parts.keys()))
+
+	# Filters applied to every section, pushed down to the parquet reads
+	(first_year, _), (last_year, _) = available_period()
+	months = [(year, month) for year in range(first_year, last_year + 1) for month in range(1, 13)]
+	st.select_slider("Period", months, value=(months[0], months[-1]), format_func=lambda month: f"{month[0]}-{month[1]:02d}", key='accidents_period')
+	departments = get_accidents_caracteristiques(('dep',))['dep'].cat.categories
+	st.multiselect("Departments (all when empty)", sorted(departments), key='accidents_departments')
 	st.markdown('---')
 	# Display the corresponding function based on the user's selection
 	center_h1(selected_part)
-	analysis_parts[selected_part](caracteristiques, usagers)
+	part = analysis_parts[selected_part]
+	with timed('section', selected_part):
+		part['function'](*load_section_data(part))
 	
\ No newline at end of file
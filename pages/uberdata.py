@@ -1,56 +1,44 @@
 import streamlit as st
-from datalib.streamlitFunctions import center_h2, center_text
+from datalib.streamlitFunctions import center_h2, center_text, plotly_chart
 from data.uberdata.uberdatadescriptions import uberdata_description, dataset_overview_text
 import pandas as pd
 import plotly.express as px
-from datalib.plots import histogram_with_stats
+from datalib.plots import histogram_with_stats, scatter_plot, scatter_summary, SCATTER_MAX_POINTS
+from datalib.datasets import cached_dataset
+from datalib.timing import timed
+from datalib.figures import cached_figure
+from datalib.geo import aggregate_cells, precision_for_zoom
+from datalib.rollups import build_rollups, rollup
+from datalib.uber import load_trips, RAW_PATH, SNAPSHOT_PATH
 from config import UBERLOGO
 import os
 from st_aggrid import AgGrid
 
-def get_data():
-    data = pd.read_csv('data/uberdata/uberdata.csv')
-    date_columns = ['tpep_pickup_datetime', 'tpep_dropoff_datetime']
-    for column in date_columns:
-        data[column] = pd.to_datetime(data[column])
-    data['hour'] = data['tpep_pickup_datetime'].dt.hour
-
-    # Calculate the duration of each trip in minutes
-    data['duration'] = (data['tpep_dropoff_datetime'] - data['tpep_pickup_datetime']).dt.total_seconds() / 60
-
-    # Remove all trips with a duration of less then 1 minute
-    data = data[data['duration'] >= 1]
-
-    # Remove all trips with passenger count of 0
-    data = data[data['passenger_count'] > 0]
-
-    # Remove all trips with a fare amount <= 0
-    data = data[data['fare_amount'] > 0]
-
-    # Remove all trips with distance <= 0
-    data = data[data['trip_distance'] > 0]
-
-    # Remove all trips with duration > 244 minutes
-    data = data[data['duration'] <= 244]
-
-    # Remove lines with a duration smaller than 13 and a total amount higher that 90
-    data = data[~((data['duration'] < 13) & (data['total_amount'] > 90))]
-
-    # Remove trip distances == 99.9
-    data = data[data['trip_distance'] != 99.9]
-
-    # Save the data to an Excel file
-        # convert to timezone unaware
-    savetoexcel = False
-    if savetoexcel:
-        print("Saving data to Excel file...")
-        data['tpep_pickup_datetime'] = data['tpep_pickup_datetime'].dt.tz_localize(None)
-        data['tpep_dropoff_datetime'] = data['tpep_dropoff_datetime'].dt.tz_localize(None)
-        data.to_excel('data/uberdata.xlsx', index=False)
-        print("Data saved to Excel file.")
-
-    
-    return data
+@cached_dataset('uber_trips', RAW_PATH, SNAPSHOT_PATH)
+def get_data(columns=None, rows=None):
+    # Cleaned, typed snapshot (hour and duration included), rebuilt when the CSV is newer.
+    # Only the given columns (and first rows) are converted, each projection is cached on its own
+    return load_trips(RAW_PATH, SNAPSHOT_PATH, columns, rows)
+
+# Per-hour and per-passenger-count metrics shared by the sections, computed in one pass
+@cached_dataset('uber_rollups', RAW_PATH, SNAPSHOT_PATH)
+def get_rollups():
+    data = get_data(('hour', 'passenger_count', 'duration', 'trip_distance', 'total_amount', 'tip_amount'))
+    return build_rollups(data, ['hour', 'passenger_count'],
+                         ['duration', 'trip_distance', 'total_amount', 'tip_amount', 'has_tip'],
+                         derived={'has_tip': lambda data: data['tip_amount'] > 0})
+
+# Distribution charts, binned once per column and bin setting until the data changes
+@cached_figure('uber_histogram', 'uber_trips')
+def get_histogram(column, title, nbins=50, log=False):
+    return histogram_with_stats(get_data((column,)), column, title, nbins, log)
+
+@cached_dataset('uber_location_cells', RAW_PATH, SNAPSHOT_PATH)
+def get_location_cells(point, zoom):
+    # Trips per geohash cell of their pickup or dropoff point, at a resolution matching the map zoom
+    data = get_data((f'{point}_latitude', f'{point}_longitude', 'fare_amount', 'total_amount', 'hour'))
+    return aggregate_cells(data, f'{point}_latitude', f'{point}_longitude', precision_for_zoom(zoom),
+                           columns=['fare_amount', 'total_amount', 'hour'])
 
 # 1. Title and Introduction
 def title_and_intro(data):
@@ -104,15 +92,16 @@ def title_and_intro(data):
 # 1. Dataset Overview
 def dataset_overview(data):
     center_h2('1. Dataset Overview')
+    log_bins = st.checkbox('Logarithmic bins', value=False, help='Bins spaced logarithmically over the positive amounts')
     cols = st.columns(2)
 
     with cols[0]:
-        fig_fare = histogram_with_stats(data, 'fare_amount', 'Fare Amount Distribution')
-        st.plotly_chart(fig_fare, use_container_width=True)
+        fig_fare = get_histogram('fare_amount', 'Fare Amount Distribution', log=log_bins)
+        plotly_chart(fig_fare, use_container_width=True)
 
     with cols[1]:
-        fig_tip = histogram_with_stats(data, 'tip_amount', 'Tip Amount Distribution')
-        st.plotly_chart(fig_tip, use_container_width=True)
+        fig_tip = get_histogram('tip_amount', 'Tip Amount Distribution', log=log_bins)
+        plotly_chart(fig_tip, use_container_width=True)
 
     center_text(dataset_overview_text)
 
@@ -125,13 +114,38 @@ def dataset_overview(data):
         column1 = st.selectbox('Select the first column', data.columns, index=data.columns.get_loc('fare_amount'))
     with col2:
         column2 = st.selectbox('Select the second column', data.columns, index=data.columns.get_loc('trip_distance'))
-    
 
-    fig = px.scatter(data, x=column1, y=column2, title=f'{column1} vs {column2}')
-    st.plotly_chart(fig, use_container_width=True)
+    # Large data is shown as a density map or a stratified sample rather than every point
+    mode = 'density'
+    if len(data) > SCATTER_MAX_POINTS:
+        rendering = st.radio('Rendering', ['Density', 'Sample'], horizontal=True,
+                             help=f'Above {SCATTER_MAX_POINTS:,} rows, the points are binned (Density) or downsampled (Sample)')
+        mode = rendering.lower()
+
+    fig = scatter_plot(data, column1, column2, f'{column1} vs {column2}', mode=mode)
+    plotly_chart(fig, use_container_width=True)
+
+    # Statistics on every row, whatever the rendering
+    summary = scatter_summary(data, column1, column2)
+    correlation = f", correlation {summary['correlation']:.2f}" if summary['correlation'] is not None else ''
+    center_text(f"{summary['rows']:,} rows{correlation}")
 
     st.markdown('---')
 
+@cached_figure('uber_correlation_heatmap', 'uber_trips')
+def correlation_heatmap():
+    # Select relevant columns for correlation
+    correlation_data = get_data(('total_amount', 'trip_distance', 'duration', 'passenger_count', 'fare_amount', 'tip_amount'))
+    correlation_matrix = correlation_data.corr()
+
+    return px.imshow(
+        correlation_matrix, 
+        title='Correlation Between Key Revenue Factors',
+        labels={'color': 'Correlation'},
+        color_continuous_scale='RdBu',  # Red-Blue color scale
+        height=500
+    )
+
 # 2. Exploring Trip Duration and Distance
 def trip_duration_and_distance(data):
     # Title
@@ -156,7 +170,7 @@ def trip_duration_and_distance(data):
             labels={'duration': 'Trip Duration (minutes)'},  # Updated axis label
             color_discrete_sequence=['#FF6F61']  # Changed color to a pleasant red-orange
         )
-        st.plotly_chart(fig_duration, use_container_width=True)
+        plotly_chart(fig_duration, use_container_width=True)
         st.markdown('**Insight:** Most trips last between 5 and 10 minutes.')
 
     with col2:
@@ -168,7 +182,7 @@ def trip_duration_and_distance(data):
             labels={'trip_distance': 'Trip Distance (miles)'},  # Updated axis label
             color_discrete_sequence=['#6B5B95']  # Changed color to a soft purple
         )
-        st.plotly_chart(fig_distance, use_container_width=True)
+        plotly_chart(fig_distance, use_container_width=True)
         st.markdown('**Insight:** The majority of trips are under 5 miles, with a few longer trips.')
 
     # Second row: Scatter Plot - Trip Duration vs Distance
@@ -186,7 +200,7 @@ def trip_duration_and_distance(data):
             labels={'trip_distance': 'Trip Distance (miles)', 'duration': 'Trip Duration (minutes)'},  # Updated axis labels
             color_discrete_sequence=['#88B04B']  # Changed color to a fresh green
         )
-        st.plotly_chart(fig_duration_distance, use_container_width=True)
+        plotly_chart(fig_duration_distance, use_container_width=True)
 
     with col2:
         st.markdown('''
@@ -202,7 +216,7 @@ def trip_duration_and_distance(data):
     col1, col2 = st.columns(2)
 
     with col1:
-        avg_duration_by_hour = data.groupby('hour')['duration'].mean().reset_index()
+        avg_duration_by_hour = rollup(get_rollups(), 'hour', 'duration')
         fig_duration_by_hour = px.line(
             avg_duration_by_hour, 
             x='hour', 
@@ -212,11 +226,11 @@ def trip_duration_and_distance(data):
             line_shape='spline',  # Smooth the line for better aesthetics
             color_discrete_sequence=['#F7CAC9']  # Changed color to a light pink
         )
-        st.plotly_chart(fig_duration_by_hour, use_container_width=True)
+        plotly_chart(fig_duration_by_hour, use_container_width=True)
         st.markdown('**Insight:** Trips tend to take longer during the afternoon.')
 
     with col2:
-        avg_distance_by_hour = data.groupby('hour')['trip_distance'].mean().reset_index()
+        avg_distance_by_hour = rollup(get_rollups(), 'hour', 'trip_distance')
         fig_distance_by_hour = px.line(
             avg_distance_by_hour, 
             x='hour', 
@@ -226,7 +240,7 @@ def trip_duration_and_distance(data):
             line_shape='spline',  # Smooth the line
             color_discrete_sequence=['#92A8D1']  # Changed color to a light blue
         )
-        st.plotly_chart(fig_distance_by_hour, use_container_width=True)
+        plotly_chart(fig_distance_by_hour, use_container_width=True)
         st.markdown('**Insight:** The average trip distance increases around 4 AM.')
 
     st.markdown('---')
@@ -254,7 +268,7 @@ def time_and_location_analysis(data):
     st.markdown('---')
     st.subheader("Trip Count by Hour of the Day")
     
-    trip_count_by_hour = data.groupby('hour')['duration'].count().reset_index()
+    trip_count_by_hour = rollup(get_rollups(), 'hour', 'duration', 'count')
     
     fig_trip_count_by_hour = px.bar(
         trip_count_by_hour, 
@@ -265,61 +279,71 @@ def time_and_location_analysis(data):
         color_discrete_sequence=['#FFB347']  # Warm orange tone
     )
     
-    st.plotly_chart(fig_trip_count_by_hour, use_container_width=True)
+    plotly_chart(fig_trip_count_by_hour, use_container_width=True)
     st.markdown('**Insight:** Most trips occur during the late afternoon and evening, indicating high activity during commute hours.')
 
     # Second row: Pickup Locations - Scatter Plot
     st.markdown('---')
+    # Trips are aggregated per map cell, finer as the zoom increases
+    zoom = st.select_slider('Map zoom', options=list(range(8, 15)), value=10)
     col1, col2 = st.columns(2)
 
     # Geographical Distribution of Pickup Locations
     with col1:
         st.subheader("Geographical Distribution of Pickup Locations")
         
-        # Use latitude, longitude for scatter plot of pickup locations, and color based on the time of day (hour)
+        # One marker per geohash cell, sized by its number of trips and colored by their mean hour
         fig_pickup_locations = px.scatter_mapbox(
-            data, 
+            get_location_cells('pickup', zoom), 
             lat="pickup_latitude", 
             lon="pickup_longitude", 
             color='hour',  # Color based on time of day
+            size='count',
+            hover_data={'count': True, 'fare_amount': ':.2f'},
             color_continuous_scale='Sunsetdark',  # Use a color scale representing day-night cycle
             title="Geographical Distribution of Pickup Locations by Time of Day",
             labels={
                 'pickup_latitude': 'Pickup Latitude', 
                 'pickup_longitude': 'Pickup Longitude',
-                'hour': 'Hour of the Day'
+                'hour': 'Mean Hour of the Day',
+                'count': 'Trips',
+                'fare_amount': 'Mean Fare'
             },  # Updated axis labels
             mapbox_style="open-street-map",  # Use an open street map for a better visual
-            zoom=10,
+            zoom=zoom,
             height=500
         )
         
-        st.plotly_chart(fig_pickup_locations, use_container_width=True)
+        plotly_chart(fig_pickup_locations, use_container_width=True)
         st.markdown('**Insight:** Pickup locations are colored based on the hour of the day, providing a temporal view of activity patterns across the city.')
 
     # Geographical Distribution of Dropoff Locations
     with col2:
         st.subheader("Geographical Distribution of Dropoff Locations")
         
-        # Use latitude, longitude for scatter plot of dropoff locations, and color based on the time of day (hour)
+        # One marker per geohash cell, sized by its number of trips and colored by their mean hour
         fig_dropoff_locations = px.scatter_mapbox(
-            data, 
+            get_location_cells('dropoff', zoom), 
             lat="dropoff_latitude", 
             lon="dropoff_longitude", 
             color='hour',  # Color based on time of day
+            size='count',
+            hover_data={'count': True, 'fare_amount': ':.2f'},
             color_continuous_scale='Sunsetdark',  # Another continuous color scale for contrast
             title="Geographical Distribution of Dropoff Locations by Time of Day",
             labels={
                 'dropoff_latitude': 'Dropoff Latitude', 
                 'dropoff_longitude': 'Dropoff Longitude',
-                'hour': 'Hour of the Day'
+                'hour': 'Mean Hour of the Day',
+                'count': 'Trips',
+                'fare_amount': 'Mean Fare'
             },  # Updated axis labels
             mapbox_style="open-street-map",  # Use the same open street map style
-            zoom=10,
+            zoom=zoom,
             height=500
         )
         
-        st.plotly_chart(fig_dropoff_locations, use_container_width=True)
+        plotly_chart(fig_dropoff_locations, use_container_width=True)
         st.markdown('**Insight:** Dropoff locations are colored by hour, revealing how dropoff patterns vary throughout the day, particularly in central and peripheral areas.')
 
 
@@ -354,15 +378,14 @@ def passenger_count_and_earnings(data):
             labels={'passenger_count': 'Number of Passengers'},  # Updated axis label
             color_discrete_sequence=['#4C9F70']  # Pleasant green color
         )
-        st.plotly_chart(fig_passenger_count, use_container_width=True)
+        plotly_chart(fig_passenger_count, use_container_width=True)
         st.markdown('**Insight:** Most trips have 1 or 2 passengers, with very few trips carrying 5 or more passengers.')
 
     with col2:
         st.subheader("Percentage of Rides with Tips by Passenger Count")
 
         # Calculate the percentage of rides with tips for each passenger count
-        data['has_tip'] = data['tip_amount'] > 0  # Create a boolean column to indicate if a tip was given
-        percentage_tips_by_passenger = data.groupby('passenger_count')['has_tip'].mean().reset_index()
+        percentage_tips_by_passenger = rollup(get_rollups(), 'passenger_count', 'has_tip')  # Share of the rides with a tip
         percentage_tips_by_passenger['has_tip'] *= 100  # Convert to percentage
 
         # Create a bar chart to show the percentage of rides with tips for each passenger count
@@ -376,7 +399,7 @@ def passenger_count_and_earnings(data):
             height=500
         )
 
-        st.plotly_chart(fig_percentage_tips, use_container_width=True)
+        plotly_chart(fig_percentage_tips, use_container_width=True)
         st.markdown('**Insight:** In general about 60% of trips give a tip. Trips with 2, 3 and 4 passengers tend to give tips slightly less often.')
 
     # Second row: Box Plot for Total Fare by Passenger Count
@@ -391,7 +414,7 @@ def passenger_count_and_earnings(data):
         labels={'passenger_count': 'Number of Passengers', 'total_amount': 'Total Fare (USD)'},  # Updated axis labels
         color_discrete_sequence=['#FFA07A']  # Light salmon color
     )
-    st.plotly_chart(fig_fare_by_passengers, use_container_width=True)
+    plotly_chart(fig_fare_by_passengers, use_container_width=True)
     st.markdown('**Insight:** While trips with more passengers tend to have higher fares, there are a few outliers with high fares even for trips with fewer passengers.')
 
     # Third row: Scatter Plot for Total Fare vs Tip Amount by Passenger Count
@@ -408,7 +431,7 @@ def passenger_count_and_earnings(data):
         color_continuous_scale='Agsunset',  # Continuous color scale based on passenger count
         height=500
     )
-    st.plotly_chart(fig_fare_vs_tip, use_container_width=True)
+    plotly_chart(fig_fare_vs_tip, use_container_width=True)
     st.markdown('''
     **Key Observations:**
     - Trips with higher fares tend to receive higher tips.
@@ -420,7 +443,7 @@ def passenger_count_and_earnings(data):
     st.markdown('---')
     st.subheader("Average Tip Amount by Passenger Count")
     
-    avg_tip_by_passenger = data.groupby('passenger_count')['tip_amount'].mean().reset_index()
+    avg_tip_by_passenger = rollup(get_rollups(), 'passenger_count', 'tip_amount')
     fig_avg_tip_by_passenger = px.bar(
         avg_tip_by_passenger, 
         x='passenger_count', 
@@ -430,7 +453,7 @@ def passenger_count_and_earnings(data):
         color_discrete_sequence=['#87CEEB'],  # Sky blue color for the bar chart
         height=500
     )
-    st.plotly_chart(fig_avg_tip_by_passenger, use_container_width=True)
+    plotly_chart(fig_avg_tip_by_passenger, use_container_width=True)
     st.markdown('**Insight:** Trips with 2 or more passengers generally yield higher tips compared to single-passenger trips.')
 
     st.markdown('---')
@@ -464,14 +487,14 @@ def revenue_maximization_factors(data):
         color_continuous_scale='Viridis',  # Color scale for duration
         height=500
     )
-    st.plotly_chart(fig_fare_vs_distance, use_container_width=True)
+    plotly_chart(fig_fare_vs_distance, use_container_width=True)
     st.markdown('**Insight:** Longer trips tend to result in higher fares, but shorter trips with longer durations can also yield significant earnings.')
 
     # Second row: Average Total Fare by Hour of the Day
     st.markdown('---')
     st.subheader("Average Total Fare by Hour of the Day")
     
-    avg_fare_by_hour = data.groupby('hour')['total_amount'].mean().reset_index()
+    avg_fare_by_hour = rollup(get_rollups(), 'hour', 'total_amount')
     
     fig_avg_fare_by_hour = px.bar(
         avg_fare_by_hour, 
@@ -482,7 +505,7 @@ def revenue_maximization_factors(data):
         color_discrete_sequence=['#FF6F61'],  # Pleasant red-orange color
         height=500
     )
-    st.plotly_chart(fig_avg_fare_by_hour, use_container_width=True)
+    plotly_chart(fig_avg_fare_by_hour, use_container_width=True)
     st.markdown('**Insight:** Average fares are generally higher during late-night and early morning hours, suggesting that these times might yield higher earnings.')
 
 
@@ -490,18 +513,8 @@ def revenue_maximization_factors(data):
     st.markdown('---')
     st.subheader("Correlation Heatmap of Key Factors Influencing Revenue")
 
-    # Select relevant columns for correlation
-    correlation_data = data[['total_amount', 'trip_distance', 'duration', 'passenger_count', 'fare_amount', 'tip_amount']]
-    correlation_matrix = correlation_data.corr()
-
-    fig_corr_heatmap = px.imshow(
-        correlation_matrix, 
-        title='Correlation Between Key Revenue Factors',
-        labels={'color': 'Correlation'},
-        color_continuous_scale='RdBu',  # Red-Blue color scale
-        height=500
-    )
-    st.plotly_chart(fig_corr_heatmap, use_container_width=True)
+    fig_corr_heatmap = correlation_heatmap()
+    plotly_chart(fig_corr_heatmap, use_container_width=True)
     st.markdown('**Insight:** Total fare is strongly correlated with trip distance and duration, while passenger count has a weaker influence on overall earnings.')
     
     st.markdown('---')
@@ -525,7 +538,7 @@ def optimization_insights(data):
     st.markdown('---')
     st.subheader("Optimal Times for Earnings")
 
-    avg_fare_by_hour = data.groupby('hour')['total_amount'].mean().reset_index()
+    avg_fare_by_hour = rollup(get_rollups(), 'hour', 'total_amount')
 
     fig_optimal_times = px.bar(
         avg_fare_by_hour, 
@@ -537,15 +550,15 @@ def optimization_insights(data):
         color_continuous_scale='Blues',
         height=500
     )
-    st.plotly_chart(fig_optimal_times, use_container_width=True)
+    plotly_chart(fig_optimal_times, use_container_width=True)
     st.markdown('**Insight:** Late-night and early morning hours typically yield the highest average earnings, suggesting these times as optimal for operation.')
 
         # Second row: Optimal Locations for Pickups and Dropoffs
     st.markdown('---')
     st.subheader("Optimal Locations for Pickups and Dropoffs")
 
-    # Aggregate data to calculate average fare per pickup location
-    avg_fare_by_location = data.groupby(['pickup_latitude', 'pickup_longitude'])['total_amount'].mean().reset_index()
+    # Aggregate data to calculate average fare per pickup area (geohash cell)
+    avg_fare_by_location = get_location_cells('pickup', 10)
 
     # Create a scatter mapbox plot for optimal pickup locations
     fig_optimal_locations = px.scatter_mapbox(
@@ -555,12 +568,13 @@ def optimization_insights(data):
         size='total_amount',  # Circle size represents the average fare
         color='total_amount',  # Color also represents average fare
         color_continuous_scale='Viridis',  # Color scale for visual differentiation
+        hover_data={'count': True},
         mapbox_style="open-street-map",
         zoom=10,
         height=500,
         title='Optimal Pickup Locations for Maximizing Earnings'
     )
-    st.plotly_chart(fig_optimal_locations, use_container_width=True)
+    plotly_chart(fig_optimal_locations, use_container_width=True)
     st.markdown('**Insight:** Certain locations consistently offer higher average fares, identifying them as strategic spots for pickups.')
 
 
@@ -576,14 +590,14 @@ def optimization_insights(data):
         labels={'trip_distance': 'Trip Distance (miles)', 'total_amount': 'Earnings (USD)'},
         height=500
     )
-    st.plotly_chart(fig_distance_earnings, use_container_width=True)
+    plotly_chart(fig_distance_earnings, use_container_width=True)
     st.markdown('**Insight:** There is a positive correlation between trip distance and earnings, suggesting longer trips are generally more profitable.')
 
     # Fourth row: Advice on Passenger Count Management
     st.markdown('---')
     st.subheader("Advice on Passenger Count Management")
 
-    avg_earnings_by_passenger = data.groupby('passenger_count')['total_amount'].mean().reset_index()
+    avg_earnings_by_passenger = rollup(get_rollups(), 'passenger_count', 'total_amount')
 
     fig_passenger_earnings = px.bar(
         avg_earnings_by_passenger,
@@ -595,7 +609,7 @@ def optimization_insights(data):
         color_continuous_scale='Reds',
         height=500
     )
-    st.plotly_chart(fig_passenger_earnings, use_container_width=True)
+    plotly_chart(fig_passenger_earnings, use_container_width=True)
     st.markdown('**Insight:** While earnings per trip increase with more passengers, strategies to attract groups of 2 could optimize earnings.')
 
     st.markdown('---')
@@ -649,23 +663,29 @@ def conclusion(data):
     st.markdown("This comprehensive analysis aims to empower Uber drivers with data-driven insights to make informed decisions that enhance their efficiency and profitability.")
 
 
+# Every part with the trip columns it reads (None: all of them, (): none, it only uses the shared aggregates)
 parts_of_analysis = {
-    '1. Dataset Overview': dataset_overview,
-    '2. Exploring Trip Duration and Distance': trip_duration_and_distance,
-    '3. Time and Location Analysis': time_and_location_analysis,
-    "4. Passenger Count and Earnings": passenger_count_and_earnings,
-    "5. Revenue Maximization Factors": revenue_maximization_factors,
-    "6. Optimization Insights": optimization_insights,
-    "Conclusion": conclusion,
+    '1. Dataset Overview': {'function': dataset_overview, 'columns': None},
+    '2. Exploring Trip Duration and Distance': {'function': trip_duration_and_distance, 'columns': ('duration', 'trip_distance', 'hour')},
+    '3. Time and Location Analysis': {'function': time_and_location_analysis, 'columns': ()},
+    "4. Passenger Count and Earnings": {'function': passenger_count_and_earnings, 'columns': ('passenger_count', 'total_amount', 'tip_amount')},
+    "5. Revenue Maximization Factors": {'function': revenue_maximization_factors, 'columns': ('trip_distance', 'total_amount', 'duration')},
+    "6. Optimization Insights": {'function': optimization_insights, 'columns': ('trip_distance', 'total_amount')},
+    "Conclusion": {'function': conclusion, 'columns': ()},
 }
 
+def load_part_data(part):
+    # Only the columns the part declared
+    return get_data(part['columns']) if part['columns'] != () else None
+
 
 # Main dashboard function
 def uberdata():
-    # get the data
-    data = get_data()
-    title_and_intro(data)
+    # The introduction only shows the first rows
+    title_and_intro(get_data(None, 10))
     # Call each function to render respective sections
     selected_parts = st.selectbox('Select a part of the analysis', list(parts_of_analysis.keys()))
-    parts_of_analysis[selected_parts](data)
+    part = parts_of_analysis[selected_parts]
+    with timed('section', selected_parts):
+        part['function'](load_part_data(part))
     